@@ -0,0 +1,137 @@
+import json
+import logging
+from collections import Counter, deque
+from datetime import datetime
+from typing import Deque, Dict, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+RULES = ("clutch_rate_spike", "instrument_connected_long", "duration_beyond_norm")
+
+
+def merge_rules(defaults: Dict[str, dict], overrides_json: str) -> Dict[str, dict]:
+    """Defaults with per-rule settings from a JSON object laid over them"""
+    rules = {name: dict(settings) for name, settings in defaults.items()}
+    for name, settings in (json.loads(overrides_json) if overrides_json else {}).items():
+        if name not in RULES:
+            logger.warning("Unknown alert rule %r ignored", name)
+            continue
+        rules.setdefault(name, {}).update(settings)
+    return rules
+
+
+class _LiveState:
+    __slots__ = ("head", "clutches_seen", "window", "firing")
+
+    def __init__(self, head: Optional[str]):
+        self.head = head  # digest of the log's first event – a new value means a new surgery
+        self.clutches_seen = 0
+        self.window: Deque[int] = deque()  # press offsets (ms) inside the rolling window
+        self.firing: Set[Tuple[str, Optional[str]]] = set()  # (rule, subject) currently alerted
+
+
+class AnomalyDetector:
+    """Rolling-window rules over each live surgery, fed one parse at a time.
+
+    Only what changed since the last batch is looked at: new clutch presses
+    enter a time window (each press is added and dropped once, so a batch
+    costs O(new presses)), and the connected instruments and duration are
+    checked against fixed limits and the surgeon's own history. An alert
+    fires when its condition starts to hold and re-arms once it stops.
+    """
+
+    def __init__(self, rules: Dict[str, dict]):
+        self.rules = {name: settings for name, settings in rules.items() if settings.get("enabled", True)}
+        self._live: Dict[str, _LiveState] = {}  # log path → state
+        self._norms: Dict[tuple, float] = {}  # (surgeon id, procedure id, samples) → duration limit
+        self.fired: Counter = Counter()
+
+    def forget(self, key: str):
+        self._live.pop(key, None)
+
+    def observe(self, key: str, parser, surgery: dict, history=None,
+                now: Optional[datetime] = None) -> List[dict]:
+        """Alerts raised by the latest parse of the live log `key`.
+
+        `history` is the surgeon's duration sketch for the procedure, if any.
+        Returns surgery_alert message bodies; routing fields are the caller's.
+        """
+        now = now or datetime.now()
+        state = self._live.get(key)
+        if state is None or state.head != parser.head_digest or len(parser.clutch_offsets) < state.clutches_seen:
+            state = self._live[key] = _LiveState(parser.head_digest)
+
+        conditions: Dict[Tuple[str, Optional[str]], tuple] = {}  # (rule, subject) → (holds, value, limit)
+        rule = self.rules.get("clutch_rate_spike")
+        if rule:
+            conditions[("clutch_rate_spike", None)] = self._clutch_rate(state, parser.clutch_offsets, rule)
+        rule = self.rules.get("instrument_connected_long")
+        if rule:
+            for name, since in parser.connected_since.items():
+                minutes = round((now - since).total_seconds() / 60, 1)
+                conditions[("instrument_connected_long", name)] = (minutes > rule["minutes"], minutes, rule["minutes"])
+        rule = self.rules.get("duration_beyond_norm")
+        if rule and history is not None and history.count >= rule.get("min_samples", 1):
+            limit = self._norm(surgery, history, rule)
+            conditions[("duration_beyond_norm", None)] = (surgery["duration"] > limit, surgery["duration"], limit)
+
+        alerts = []
+        for alert_key, (holds, value, limit) in conditions.items():
+            if holds and alert_key not in state.firing:
+                state.firing.add(alert_key)
+                self.fired[alert_key[0]] += 1
+                alerts.append(self._alert(alert_key, value, limit, surgery, now))
+            elif not holds:
+                state.firing.discard(alert_key)
+        # Instruments removed since the last batch re-arm as well
+        state.firing = {k for k in state.firing if k in conditions}
+        return alerts
+
+    def _clutch_rate(self, state: _LiveState, offsets: List[int], rule: dict) -> tuple:
+        """(spike seen in this batch, peak presses/min, limit) over the trailing window"""
+        window_ms = rule["window_seconds"] * 1000
+        per_minute = 60.0 / rule["window_seconds"]
+        new = offsets[state.clutches_seen:]
+        # With no new presses there is no newer log time to slide the window to;
+        # otherwise the window as it stood was judged by the previous batch
+        peak = 0 if new else len(state.window)
+        for offset in new:
+            state.window.append(offset)
+            while state.window[0] <= offset - window_ms:
+                state.window.popleft()
+            peak = max(peak, len(state.window))
+        state.clutches_seen = len(offsets)
+        rate = round(peak * per_minute, 1)
+        return rate >= rule["per_minute"], rate, rule["per_minute"]
+
+    def _norm(self, surgery: dict, history, rule: dict) -> float:
+        """The surgeon's duration percentile plus margin, cached until the history grows"""
+        cache_key = (surgery.get("surgeon_id"), surgery.get("procedure_id"), history.count)
+        limit = self._norms.get(cache_key)
+        if limit is None:
+            limit = round(history.quantile(rule["percentile"] / 100) + rule.get("margin_minutes", 0), 1)
+            self._norms = {k: v for k, v in self._norms.items() if k[:2] != cache_key[:2]}
+            self._norms[cache_key] = limit
+        return limit
+
+    @staticmethod
+    def _alert(alert_key: Tuple[str, Optional[str]], value, limit, surgery: dict, now: datetime) -> dict:
+        rule, subject = alert_key
+        if rule == "clutch_rate_spike":
+            message = f"Clutch rate {value}/min (limit {limit}/min)"
+        elif rule == "instrument_connected_long":
+            message = f"{subject} connected for {value} min (limit {limit} min)"
+        else:
+            message = f"Case at {value} min, beyond the surgeon's usual {limit} min for {surgery['procedure_name']}"
+        return {
+            "type": "surgery_alert",
+            "rule": rule,
+            "subject": subject,
+            "value": value,
+            "limit": limit,
+            "message": message,
+            "at": now.isoformat(timespec="seconds"),
+        }
+
+    def stats(self) -> dict:
+        return {"live": len(self._live), "rules": sorted(self.rules), "fired": dict(self.fired)}
@@ -0,0 +1,273 @@
+"""Micro-benchmarks for the per-update hot path: decode, parse, hash, serialize.
+
+    python backend/benchmarks/bench_parser.py                   # compare with baseline.json
+    python backend/benchmarks/bench_parser.py --update-baseline # record a new baseline
+    python backend/benchmarks/bench_parser.py --sizes 100 1000  # quicker run
+    python backend/benchmarks/bench_parser.py --repeats 5       # steadier figures
+
+Two implementations are measured on the same synthetic logs:
+  main   – surgery_parser (what main.py ingests with), the live update digest
+           and the broadcast encoding
+  legacy – parse_surgery_json / _get_hash / serialize_surgery_data from test.py
+
+Timings are divided by a fixed calibration workload measured in the same run,
+so the committed baseline carries over between machines of different speed.
+Stages that finish in microseconds are called in batches long enough to
+time reliably. The whole measurement is repeated and each stage keeps its
+fastest round, so a slow spell on a busy machine does not read as a
+regression.
+
+Exits with status 1 when any stage is slower (or allocates more) than the
+baseline by more than the tolerance.
+"""
+import argparse
+import ast
+import gc
+import json
+import logging
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+BACKEND = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND))
+
+from surgery_parser import parse_surgery_json, update_digest  # noqa: E402
+
+BASELINE_PATH = Path(__file__).with_name("baseline.json")
+DEFAULT_SIZES = [100, 1_000, 10_000, 200_000]
+
+ARMS = ["PrimaryLeft", "PrimaryRight", "Secondary"]
+INSTRUMENTS = [
+    "Monopolar_Cautery_Hook", "Vessel Sealer Extend", "SynchroSeal", "Small_Graptor",
+    "Cobra_Grasper", "Fenestrated_Bipolar_Forceps", "Cadiere_Forceps", "Potts_Scissors",
+]
+
+
+# ========================================
+# SYNTHETIC LOGS
+# ========================================
+def synthetic_log(num_events: int, seed: int = 7) -> List[Dict[str, Any]]:
+    """A live surgery log of about num_events events: mostly clutch presses,
+    with instrument swaps, counts and connected-duration reports mixed in"""
+    rng = random.Random(seed)
+    start = datetime(2025, 1, 6, 8, 0, 0)
+    events = [
+        {"time": start.isoformat(), "event": "Surgery type selected", "value": "Nephrectomy"},
+        {"time": start.isoformat(), "event": "Surgeon Name", "value": "Dr.Raj"},
+        {"time": start.isoformat(), "event": "Patient Info", "value": "Name: Patient_42, Age: 57, BMI: 27.3"},
+        {"time": start.isoformat(), "event": "Surgery started", "value": start.strftime("%Y-%m-%d %H:%M:%S")},
+    ]
+    now = start
+    mounted: Dict[str, str] = {}
+    while len(events) < num_events:
+        now += timedelta(seconds=rng.uniform(0.5, 6.0))
+        stamp = now.isoformat()
+        roll = rng.random()
+        if roll < 0.55:
+            events.append({"time": stamp, "event": "Clutch Pedal Pressed", "value": str(len(events))})
+        elif roll < 0.70 or not mounted:
+            arm = rng.choice(ARMS)
+            if arm in mounted:
+                events.append({"time": stamp, "event": f"{arm} Instrument removed", "value": mounted.pop(arm)})
+            else:
+                mounted[arm] = rng.choice(INSTRUMENTS)
+                events.append({"time": stamp, "event": f"{arm} Instrument Name", "value": mounted[arm]})
+        elif roll < 0.85:
+            arm = rng.choice(list(mounted))
+            events.append({"time": stamp, "event": f"{arm} Instrument Count is ", "value": str(rng.randint(1, 9))})
+        else:
+            arm = rng.choice(list(mounted))
+            events.append({"time": stamp, "event": f"{arm} Instrument Connected duration is ",
+                           "value": str(round(rng.uniform(10, 3600), 1))})
+    return events[:num_events]
+
+
+# ========================================
+# IMPLEMENTATIONS UNDER TEST
+# ========================================
+def load_legacy(path: Path = BACKEND / "test.py") -> Dict[str, Callable]:
+    """Pull the hot functions out of test.py without importing it.
+
+    Importing would initialise the database and build a FastAPI app (and the
+    module name shadows the stdlib `test` package), so only the three
+    definitions are compiled, in a namespace with what they reference.
+    """
+    tree = ast.parse(path.read_text(encoding="utf-8"))
+    wanted = {"parse_surgery_json", "serialize_surgery_data", "_get_hash"}
+    nodes = []
+    for node in tree.body:
+        if isinstance(node, ast.ClassDef):
+            nodes += [n for n in node.body if isinstance(n, ast.FunctionDef) and n.name in wanted]
+        elif isinstance(node, ast.FunctionDef) and node.name in wanted:
+            nodes.append(node)
+    namespace = {
+        "json": json, "datetime": datetime, "Dict": Dict, "Any": Any, "List": List,
+        "logger": logging.getLogger("bench.legacy"),
+    }
+    exec(compile(ast.Module(body=nodes, type_ignores=[]), str(path), "exec"), namespace)
+    return {name: namespace[name] for name in wanted}
+
+
+def stages(events: List[Dict[str, Any]], raw: str, legacy: Dict[str, Callable]) -> Dict[str, Callable[[], Any]]:
+    main_surgery = parse_surgery_json(events)
+    legacy_surgery = legacy["parse_surgery_json"](events)
+    message = {"type": "surgery_update", "surgery": main_surgery, "surgeon_name": "Dr.Raj", "status": "live"}
+    return {
+        "decode": lambda: json.loads(raw),
+        "main.parse": lambda: parse_surgery_json(events),
+        "main.hash": lambda: update_digest(main_surgery),
+        "main.serialize": lambda: json.dumps(message, default=str),
+        "legacy.parse": lambda: legacy["parse_surgery_json"](events),
+        "legacy.hash": lambda: legacy["_get_hash"](None, legacy_surgery),
+        "legacy.serialize": lambda: json.dumps(legacy["serialize_surgery_data"](legacy_surgery)),
+    }
+
+
+# ========================================
+# MEASUREMENT
+# ========================================
+MIN_SAMPLE = 2e-3  # seconds; a single timed sample shorter than this is mostly timer noise
+
+
+def best_time(fn: Callable[[], Any], budget: float = 0.3, max_runs: int = 200) -> float:
+    """Seconds per call: the fastest of as many samples as fit in `budget`
+    seconds (at least three). Like timeit.autorange, a sample calls `fn` as
+    many times as it takes to last MIN_SAMPLE. The cyclic GC is paused while
+    timing, as timeit does, so a collection triggered by an earlier stage's
+    garbage does not land in this one."""
+    best, spent, runs = float("inf"), 0.0, 0
+    gc.collect()
+    gc.disable()
+    try:
+        number = 1
+        while True:
+            started = time.perf_counter()
+            for _ in range(number):
+                fn()
+            if time.perf_counter() - started >= MIN_SAMPLE:
+                break
+            number *= 2
+        while runs < 3 or (spent < budget and runs < max_runs):
+            started = time.perf_counter()
+            for _ in range(number):
+                fn()
+            elapsed = time.perf_counter() - started
+            best, spent, runs = min(best, elapsed / number), spent + elapsed, runs + 1
+    finally:
+        gc.enable()
+    return best
+
+
+def peak_bytes(fn: Callable[[], Any]) -> int:
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def calibration() -> float:
+    """A fixed pure-Python workload used as the unit of time"""
+    payload = [{"time": f"2025-01-06T08:{i % 60:02d}:00", "event": "Clutch Pedal Pressed", "value": str(i)}
+               for i in range(2000)]
+    def work():
+        counts: Dict[str, int] = {}
+        for event in json.loads(json.dumps(payload)):
+            counts[event["event"]] = counts.get(event["event"], 0) + len(event["time"])
+        return counts
+    return best_time(work, budget=0.5)
+
+
+def measure(timed: Dict[str, Callable[[], Any]]) -> tuple[Dict[str, float], float]:
+    """One round: seconds per call of every stage, and the calibration unit.
+    The calibration runs before and after the stages and the faster one
+    counts, so a slow spell during either does not skew the round."""
+    before = calibration()
+    seconds = {key: best_time(fn) for key, fn in timed.items()}
+    return seconds, min(before, calibration())
+
+
+def run(sizes: List[int], repeats: int = 3) -> Dict[str, Dict[str, float]]:
+    """Best time of each stage over `repeats` rounds, against the best unit.
+    Slow spells on a busy machine last longer than a stage takes, so they
+    spoil whole rounds of a stage; the fastest round is the one they missed."""
+    legacy = load_legacy()
+    timed: Dict[str, Callable[[], Any]] = {}
+    sizes_of: Dict[str, int] = {}
+    for size in sizes:
+        events = synthetic_log(size)
+        for stage, fn in stages(events, json.dumps(events), legacy).items():
+            timed[f"{stage}@{size}"], sizes_of[f"{stage}@{size}"] = fn, size
+    rounds = [measure(timed) for _ in range(max(1, repeats))]
+    unit = min(u for _, u in rounds)
+    results: Dict[str, Dict[str, float]] = {}
+    for key, fn in timed.items():
+        seconds = min(r[key] for r, _ in rounds)
+        results[key] = {
+            "seconds": seconds,
+            "relative": seconds / unit,
+            "ns_per_event": seconds / sizes_of[key] * 1e9,
+            "bytes_per_event": peak_bytes(fn) / sizes_of[key],
+        }
+    return results
+
+
+# ========================================
+# BASELINE
+# ========================================
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]],
+            tolerance: float, alloc_tolerance: float) -> List[str]:
+    failures = []
+    for key, current in results.items():
+        base = baseline.get(key)
+        if base is None:
+            continue
+        # Ratios carry over between machines; seconds do not
+        if current["relative"] > base["relative"] * (1 + tolerance):
+            failures.append(f"{key}: {current['relative'] / base['relative'] - 1:+.0%} time vs baseline")
+        if current["bytes_per_event"] > base["bytes_per_event"] * (1 + alloc_tolerance) + 1:
+            failures.append(f"{key}: {current['bytes_per_event'] / base['bytes_per_event'] - 1:+.0%} memory vs baseline")
+    return failures
+
+
+def report(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]]):
+    print(f"{'stage@events':<26}{'time':>12}{'ns/event':>12}{'B/event':>10}{'vs base':>10}")
+    for key, r in results.items():
+        base = baseline.get(key)
+        delta = f"{r['relative'] / base['relative'] - 1:+.0%}" if base else "new"
+        print(f"{key:<26}{r['seconds'] * 1e3:>10.3f}ms{r['ns_per_event']:>12.0f}{r['bytes_per_event']:>10.0f}{delta:>10}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--repeats", type=int, default=3, help="rounds to take the best of")
+    parser.add_argument("--tolerance", type=float, default=0.50, help="allowed slowdown, 0.50 = 50%%")
+    parser.add_argument("--alloc-tolerance", type=float, default=0.10, help="allowed peak-memory growth")
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args()
+
+    baseline = json.loads(BASELINE_PATH.read_text()) if BASELINE_PATH.exists() else {}
+    results = run(args.sizes, args.repeats)
+    report(results, baseline)
+
+    if args.update_baseline:
+        baseline.update({key: {k: round(v, 6) for k, v in r.items()} for key, r in results.items()})
+        BASELINE_PATH.write_text(json.dumps(baseline, indent=2, sort_keys=True) + "\n")
+        print(f"Baseline written to {BASELINE_PATH}")
+        return 0
+
+    failures = compare(results, baseline, args.tolerance, args.alloc_tolerance)
+    for failure in failures:
+        print(f"REGRESSION {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,100 @@
+import re
+import logging
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+KINDS = ("surgeon", "procedure", "instrument")
+IMAGE_FOLDERS = {"surgeon": "surgeons", "instrument": "instruments"}  # under public/
+
+
+def catalog_key(name) -> str:
+    """Lookup key for a name – the same rule as the frontend's imagePath.normalize,
+    so 'Dr.Raj', 'dr raj' and 'DR_RAJ' are one surgeon and share dr_raj.png"""
+    return re.sub(r"[^a-z0-9]+", "_", str(name).strip().lower()).strip("_")
+
+
+class Catalog:
+    """In-memory dictionary of canonical surgeon, procedure and instrument ids.
+
+    Names are resolved once at ingest: a hit is a dict lookup, a miss inserts
+    the canonical entry into the `catalog` table. Extra spellings can be
+    mapped onto an entry through `catalog_aliases` (POST /catalog/aliases).
+    Workers that only read reload the tables when they meet a name another
+    worker interned, or when the leader announces a new alias.
+    """
+
+    def __init__(self, public_dir: Path):
+        self.public_dir = public_dir
+        self._ids: Dict[Tuple[str, str], int] = {}  # (kind, key or alias) → id
+        self._entries: Dict[int, dict] = {}  # id → entry
+
+    def _add(self, entry_id: int, kind: str, name: str, key: str) -> dict:
+        folder = IMAGE_FOLDERS.get(kind)
+        image = f"/{folder}/{key}.png" if folder and (self.public_dir / folder / f"{key}.png").exists() else None
+        entry = {"id": entry_id, "kind": kind, "name": name, "key": key, "image": image}
+        self._entries[entry_id] = entry
+        self._ids[(kind, key)] = entry_id
+        return entry
+
+    async def load(self, db):
+        cursor = await db.execute("SELECT id, kind, name, key FROM catalog")
+        for entry_id, kind, name, key in await cursor.fetchall():
+            if entry_id not in self._entries:
+                self._add(entry_id, kind, name, key)
+        cursor = await db.execute("SELECT kind, alias_key, catalog_id FROM catalog_aliases")
+        for kind, alias_key, entry_id in await cursor.fetchall():
+            self._ids[(kind, alias_key)] = entry_id
+
+    def lookup(self, kind: str, name) -> dict | None:
+        return self._entries.get(self._ids.get((kind, catalog_key(name))))
+
+    async def resolve(self, db, kind: str, name) -> dict | None:
+        """Read-side lookup, reloading once for names interned elsewhere"""
+        entry = self.lookup(kind, name)
+        if entry is None and catalog_key(name):
+            await self.load(db)
+            entry = self.lookup(kind, name)
+        return entry
+
+    async def intern(self, writer, kind: str, name) -> dict | None:
+        """Id for a name, creating the catalog entry on first sight"""
+        entry = self.lookup(kind, name)
+        key = catalog_key(name)
+        if entry is not None or not key:
+            return entry
+        async with writer.transaction() as db:
+            await db.execute(
+                "INSERT OR IGNORE INTO catalog (kind, name, key) VALUES (?, ?, ?)",
+                (kind, str(name).strip(), key),
+            )
+            cursor = await db.execute("SELECT id, name FROM catalog WHERE kind = ? AND key = ?", (kind, key))
+            entry_id, canonical = await cursor.fetchone()
+        logger.info("Catalog: new %s %r → %s", kind, canonical, entry_id)
+        return self._add(entry_id, kind, canonical, key)
+
+    async def alias(self, writer, kind: str, alias, name) -> Tuple[dict, int | None] | None:
+        """Map the spelling `alias` onto the entry for `name`, creating that entry
+        if need be. Returns the entry and the id `alias` resolved to before,
+        when that was a different entry (whose rows the caller re-points)."""
+        alias_key = catalog_key(alias)
+        target = await self.intern(writer, kind, name)
+        if target is None or not alias_key:
+            return None
+        previous = self._ids.get((kind, alias_key))
+        if alias_key != target["key"]:
+            async with writer.transaction() as db:
+                await db.execute(
+                    "INSERT OR REPLACE INTO catalog_aliases (kind, alias_key, catalog_id) VALUES (?, ?, ?)",
+                    (kind, alias_key, target["id"]),
+                )
+            self._ids[(kind, alias_key)] = target["id"]
+            logger.info("Catalog: %s %r is now an alias of %r", kind, str(alias).strip(), target["name"])
+        return target, previous if previous != target["id"] else None
+
+    def entries(self, kind: str) -> List[dict]:
+        return sorted((e for e in self._entries.values() if e["kind"] == kind), key=lambda e: e["id"])
+
+    def __len__(self) -> int:
+        return len(self._entries)
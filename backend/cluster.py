@@ -0,0 +1,202 @@
+import os
+import json
+import asyncio
+import logging
+import socket
+from pathlib import Path
+from typing import Awaitable, Callable, Optional, Set
+
+try:
+    import fcntl
+except ImportError:  # Windows – no flock, every process acts as leader
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# ========================================
+# LEADER ELECTION (file lock)
+# ========================================
+class LeaderLock:
+    """Exclusive, non-blocking flock held for as long as this process leads.
+
+    The kernel drops the lock when the holder exits (even on a crash), so a
+    follower retrying `try_acquire` takes over without any stale-lock cleanup.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._fd: Optional[int] = None
+
+    @property
+    def held(self) -> bool:
+        return self._fd is not None
+
+    def try_acquire(self) -> bool:
+        if self._fd is not None:
+            return True
+        if fcntl is None:
+            self._fd = -1
+            return True
+
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+
+        os.ftruncate(fd, 0)
+        os.write(fd, f"{os.getpid()}\n".encode())
+        self._fd = fd
+        return True
+
+    def release(self):
+        if self._fd is None:
+            return
+        if self._fd >= 0:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+        self._fd = None
+
+
+# ========================================
+# CROSS-PROCESS PUB/SUB (Unix socket)
+# ========================================
+MessageHandler = Callable[[dict], Awaitable[None]]
+
+# A follower that stops reading is cut loose once this much is queued for it
+MAX_SUBSCRIBER_BUFFER = 8 * 1024 * 1024
+MAX_MESSAGE_SIZE = 4 * 1024 * 1024
+
+
+class PubSubHub:
+    """Newline-delimited JSON fan-out from the leader to follower workers"""
+
+    def __init__(self, socket_path: Path):
+        self.socket_path = Path(socket_path)
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._subscribers: Set[asyncio.StreamWriter] = set()
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    async def serve(self):
+        # A leftover socket file means the previous leader died without cleanup
+        if self.socket_path.exists():
+            self.socket_path.unlink()
+        self._server = await asyncio.start_unix_server(
+            self._on_subscriber, path=str(self.socket_path)
+        )
+        logger.info("Pub/sub listening on %s", self.socket_path)
+
+    async def _on_subscriber(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self._subscribers.add(writer)
+        logger.info("Follower subscribed. Total: %d", len(self._subscribers))
+        try:
+            await reader.read()  # followers never send; returns on EOF
+        except ConnectionError:
+            pass
+        finally:
+            self._subscribers.discard(writer)
+            writer.close()
+            logger.info("Follower unsubscribed. Total: %d", len(self._subscribers))
+
+    async def publish(self, message: dict):
+        if not self._subscribers:
+            return
+        line = (json.dumps(message, default=str) + "\n").encode()
+        for writer in list(self._subscribers):
+            if writer.is_closing() or writer.transport.get_write_buffer_size() > MAX_SUBSCRIBER_BUFFER:
+                logger.warning("Dropping stalled follower")
+                self._subscribers.discard(writer)
+                writer.close()
+                continue
+            writer.write(line)
+
+    async def subscribe(self, on_message: MessageHandler):
+        """Relay leader messages until the leader goes away"""
+        reader, writer = await asyncio.open_unix_connection(
+            path=str(self.socket_path), limit=MAX_MESSAGE_SIZE
+        )
+        logger.info("Subscribed to leader at %s", self.socket_path)
+        try:
+            while line := await reader.readline():
+                try:
+                    await on_message(json.loads(line))
+                except Exception as e:
+                    logger.error(f"Relay error: {e}")
+        finally:
+            writer.close()
+
+    async def close(self):
+        if self._server:
+            self._server.close()
+            for writer in list(self._subscribers):
+                writer.close()
+            await self._server.wait_closed()
+            self._server = None
+            if self.socket_path.exists():
+                self.socket_path.unlink()
+
+
+# ========================================
+# CLUSTER NODE
+# ========================================
+class ClusterNode:
+    """One uvicorn worker: either the ingesting leader or a relaying follower.
+
+    The leader owns the file watcher and publishes every broadcast to the
+    followers. Followers forward what they receive to their own sockets and
+    keep retrying the lock, so one of them takes over if the leader exits.
+    """
+
+    def __init__(self, lock_path: Path, socket_path: Path, retry_interval: float = 2.0):
+        self.lock = LeaderLock(lock_path)
+        self.hub = PubSubHub(socket_path)
+        self.retry_interval = retry_interval
+        self._follow_task: Optional[asyncio.Task] = None
+
+    @property
+    def is_leader(self) -> bool:
+        return self.lock.held
+
+    @property
+    def pubsub_enabled(self) -> bool:
+        return fcntl is not None and hasattr(socket, "AF_UNIX")
+
+    async def start(self, on_promoted: Callable[[], Awaitable[None]], on_message: MessageHandler):
+        if self.lock.try_acquire():
+            await self._promote(on_promoted)
+        else:
+            logger.info("Worker %d running as follower", os.getpid())
+            self._follow_task = asyncio.create_task(self._follow(on_promoted, on_message))
+
+    async def _promote(self, on_promoted: Callable[[], Awaitable[None]]):
+        logger.info("Worker %d elected leader", os.getpid())
+        if self.pubsub_enabled:
+            await self.hub.serve()
+        await on_promoted()
+
+    async def _follow(self, on_promoted: Callable[[], Awaitable[None]], on_message: MessageHandler):
+        while True:
+            try:
+                await self.hub.subscribe(on_message)
+                logger.warning("Leader connection closed")
+            except (FileNotFoundError, ConnectionError) as e:
+                logger.debug(f"Leader not reachable: {e}")
+
+            if self.lock.try_acquire():
+                await self._promote(on_promoted)
+                return
+            await asyncio.sleep(self.retry_interval)
+
+    async def publish(self, message: dict):
+        if self.is_leader and self.pubsub_enabled:
+            await self.hub.publish(message)
+
+    async def stop(self):
+        if self._follow_task:
+            self._follow_task.cancel()
+        await self.hub.close()
+        self.lock.release()
@@ -0,0 +1,62 @@
+import sys
+import math
+from array import array
+from bisect import bisect_right
+from typing import List, Sequence
+
+try:
+    import numpy as np
+except ImportError:  # optional – the pure-Python path gives the same numbers
+    np = None
+
+# Clutch presses are stored per surgery as little-endian uint32 millisecond
+# offsets from "Surgery started", in log order
+
+
+def pack_offsets(offsets_ms: Sequence[int]) -> bytes:
+    packed = array("I", offsets_ms)
+    if sys.byteorder == "big":
+        packed.byteswap()
+    return packed.tobytes()
+
+
+def unpack_offsets(blob: bytes | None):
+    """Sorted offsets in seconds – a float64 ndarray with numpy, else a list"""
+    if not blob:
+        return np.empty(0) if np is not None else []
+    if np is not None:
+        return np.sort(np.frombuffer(blob, dtype="<u4")) / 1000.0
+    offsets = array("I")
+    offsets.frombytes(blob)
+    if sys.byteorder == "big":
+        offsets.byteswap()
+    return [ms / 1000.0 for ms in sorted(offsets)]
+
+
+def histogram(offsets, bin_seconds: float, span: float) -> List[int]:
+    """Presses per `bin_seconds` bucket from the surgery start to `span` seconds"""
+    bins = max(1, math.ceil(span / bin_seconds))
+    if np is not None:
+        index = np.minimum((offsets // bin_seconds).astype(np.int64), bins - 1)
+        return np.bincount(index, minlength=bins).tolist()
+    counts = [0] * bins
+    for offset in offsets:
+        counts[min(int(offset // bin_seconds), bins - 1)] += 1
+    return counts
+
+
+def rolling_rate(offsets, window_seconds: float, step_seconds: float, span: float) -> List[float]:
+    """Clutches per minute over the trailing `window_seconds`, sampled every
+    `step_seconds` from the start (inclusive) to `span`"""
+    steps = int(span // step_seconds) + 1
+    per_minute = 60.0 / window_seconds
+    if np is not None:
+        ends = np.arange(steps) * step_seconds
+        counts = np.searchsorted(offsets, ends, side="right") - np.searchsorted(offsets, ends - window_seconds, side="right")
+        return np.round(counts * per_minute, 3).tolist()
+    series = []
+    for step in range(steps):
+        end = step * step_seconds
+        count = bisect_right(offsets, end) - bisect_right(offsets, end - window_seconds)
+        series.append(round(count * per_minute, 3))
+    return series
@@ -1,4 +1,6 @@
 import os
+import hashlib
+import tempfile
 from pathlib import Path
 
 # Watch folder for JSON files
@@ -8,9 +10,82 @@ WATCH_FOLDER.mkdir(exist_ok=True)
 # Database
 DB_PATH = Path(__file__).parent / "misso.db"
 
+# Frontend static assets – surgeon and instrument images keyed like catalog entries
+PUBLIC_FOLDER = Path(__file__).parent.parent / "public"
+
+READER_POOL_SIZE = 4  # read-only connections per worker for API queries
+
+# Sharding: each theater's surgeries in their own database file with their own writer
+SHARDING = os.getenv("MISSO_SHARDING", "0") == "1"
+SHARD_FOLDER = Path(os.getenv("MISSO_SHARD_FOLDER", Path(__file__).parent / "shards"))
+
+# Retention: completed surgeries older than this move to monthly archive files
+ARCHIVE_DB_FOLDER = Path(__file__).parent / "archive"
+RETENTION_DAYS = int(os.getenv("MISSO_RETENTION_DAYS", "365"))  # 0 disables
+RETENTION_INTERVAL = 6 * 60 * 60  # seconds between retention runs
+
+# Ingest: logs at least this large are decoded and parsed in worker processes
+PARSE_INLINE_MAX_BYTES = 256 * 1024
+PARSE_HUGE_BYTES = 8 * 1024 * 1024  # backfill-sized logs never get every worker
+PARSE_POOL_WORKERS = max(1, min(4, (os.cpu_count() or 2) - 1))
+
+# Watcher bookkeeping: changes within the debounce window collapse into one
+# pass; per-log and per-surgeon state is capped and dropped once idle
+LOG_DEBOUNCE_SECONDS = 1.5
+WATCH_STATE_MAX_ENTRIES = 4096
+WATCH_STATE_TTL = 6 * 60 * 60  # seconds
+
+# Clutch time series: upper bound on points per /clutches response
+CLUTCH_SERIES_MAX_POINTS = 20000
+
+# /export: rows fetched and encoded per streamed chunk
+EXPORT_BATCH_SIZE = 500
+
+# Debugging: slow-operation spans plus /debug/slow and /debug/profile
+TRACING_ENABLED = os.getenv("MISSO_TRACING", "0") == "1"
+SLOW_OPS_PER_STAGE = 20  # slowest operations kept per stage
+
 # Server
 HOST = "127.0.0.1"
 PORT = 8001
+WORKERS = int(os.getenv("MISSO_WORKERS", "1"))
+
+# Multi-worker coordination: one leader ingests, the rest relay its broadcasts
+LEADER_LOCK_PATH = Path(os.getenv("MISSO_LEADER_LOCK", DB_PATH.with_suffix(".leader.lock")))
+# Unix socket paths are capped at ~100 chars, so keep it short and per-database
+PUBSUB_SOCKET_PATH = Path(os.getenv(
+    "MISSO_PUBSUB_SOCKET",
+    Path(tempfile.gettempdir()) / f"misso-{hashlib.md5(str(DB_PATH).encode()).hexdigest()[:8]}.sock"
+))
+LEADER_RETRY_INTERVAL = 2.0  # seconds between follower takeover attempts
+
+# Live surgeries: elapsed-time heartbeat between file changes
+LIVE_TICK_INTERVAL = float(os.getenv("MISSO_TICK_INTERVAL", "1.0"))  # seconds
+
+# Live alerts (anomalies.py), raised as surgery_alert messages. MISSO_ALERT_RULES
+# takes a JSON object of per-rule overrides, e.g. {"clutch_rate_spike": {"per_minute": 15}}
+ALERT_RULES = {
+    # presses per minute over a trailing window of log time
+    "clutch_rate_spike": {"enabled": True, "window_seconds": 60, "per_minute": 12},
+    # one instrument connected without a break
+    "instrument_connected_long": {"enabled": True, "minutes": 90},
+    # live duration past this percentile of the surgeon's own cases for the procedure
+    "duration_beyond_norm": {"enabled": True, "percentile": 95, "margin_minutes": 0, "min_samples": 10},
+}
+ALERT_RULES_JSON = os.getenv("MISSO_ALERT_RULES", "")
+
+# Per-client WebSocket outbox; a client further behind than this is dropped
+WS_MAX_PENDING = 256
+
+# HTTP responses at least this large are gzip-compressed (/export downloads never are)
+GZIP_MINIMUM_SIZE = 1024
+
+# Logging: written by a background thread; chatty INFO lines are rate-limited
+LOG_LEVEL = os.getenv("MISSO_LOG_LEVEL", "INFO")
+LOG_FORMAT = os.getenv("MISSO_LOG_FORMAT", "text")  # "text" or "json"
+LOG_RATE_BURST = 5  # same INFO message at most this often …
+LOG_RATE_WINDOW = 10.0  # … per this many seconds
+LOG_QUEUE_SIZE = 10000  # records beyond this are dropped, not waited on
 
 print(f"📋 Config loaded:")
 print(f"   Watch folder: {WATCH_FOLDER}")
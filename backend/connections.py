@@ -0,0 +1,272 @@
+import json
+import asyncio
+import itertools
+import logging
+from collections import OrderedDict, defaultdict
+from typing import Dict, Hashable, List, Set
+
+from fastapi import WebSocket
+
+from catalog import catalog_key
+
+logger = logging.getLogger(__name__)
+
+# ========================================
+# TOPICS
+# ========================================
+TOPIC_FIELDS = {"surgeon": "surgeon_name", "theater": "theater", "surgery_id": "surgery_id"}
+
+# Only the newest of these per surgery matters to a client that fell behind
+COALESCED_TYPES = {"surgery_update", "surgery_tick"}
+
+
+def _topic(kind: str, value) -> str:
+    # Names go through the catalog's key rule, so any spelling of a surgeon
+    # matches the canonical name broadcasts carry
+    if kind in ("surgeon", "theater"):
+        return f"{kind}:{catalog_key(value)}"
+    return f"{kind}:{str(value).strip()}"
+
+
+def message_topics(message: dict) -> List[str]:
+    """Topics a broadcast belongs to: its surgeon, theater and surgery id"""
+    return [
+        _topic(kind, message[field])
+        for kind, field in TOPIC_FIELDS.items()
+        if message.get(field) not in (None, "")
+    ]
+
+
+# ========================================
+# PER-CLIENT SEND QUEUE
+# ========================================
+class ClientChannel:
+    """Bounded outbox drained by a dedicated writer task for one socket.
+
+    Pending surgery_update/surgery_tick messages for the same surgery are
+    replaced by the newest one. When the outbox is full the oldest of those
+    is dropped; anything else (surgery_complete, replies) is never dropped,
+    and a client whose outbox holds only such messages is disconnected.
+    """
+
+    def __init__(self, websocket: WebSocket, max_pending: int):
+        self.websocket = websocket
+        self.max_pending = max_pending
+        self._pending: "OrderedDict[Hashable, str]" = OrderedDict()
+        self._ready = asyncio.Event()
+        self._seq = itertools.count()
+        self.task: asyncio.Task | None = None
+        self.sent = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.peak_pending = 0
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def enqueue(self, message_type: str, surgery_id, text: str) -> bool:
+        """Queue an encoded message; False when the client is hopelessly behind"""
+        if message_type in COALESCED_TYPES and surgery_id is not None:
+            key = (message_type, surgery_id)
+            if key in self._pending:
+                self._pending[key] = text
+                self.coalesced += 1
+                return True
+        else:
+            key = next(self._seq)
+
+        if len(self._pending) >= self.max_pending and not self._drop_oldest_coalescible():
+            return False
+
+        self._pending[key] = text
+        self.peak_pending = max(self.peak_pending, len(self._pending))
+        self._ready.set()
+        return True
+
+    def _drop_oldest_coalescible(self) -> bool:
+        for key in self._pending:
+            if isinstance(key, tuple):
+                del self._pending[key]
+                self.dropped += 1
+                return True
+        return False
+
+    async def run(self):
+        while True:
+            if not self._pending:
+                self._ready.clear()
+                await self._ready.wait()
+                continue
+            _, text = self._pending.popitem(last=False)
+            await self.websocket.send_text(text)
+            self.sent += 1
+
+    def stats(self) -> dict:
+        client = self.websocket.client
+        return {
+            "client": f"{client.host}:{client.port}" if client else None,
+            "pending": self.pending,
+            "peak_pending": self.peak_pending,
+            "sent": self.sent,
+            "coalesced": self.coalesced,
+            "dropped": self.dropped,
+        }
+
+
+# ========================================
+# WEBSOCKET MANAGER
+# ========================================
+class ConnectionManager:
+    """WebSocket clients plus a topic → connections index.
+
+    A client that never subscribes receives every message, as before. Once it
+    subscribes to a surgeon, theater or surgery id it only receives
+    broadcasts for those topics. Broadcasting only encodes the message once
+    and queues it; each client's writer task does the actual send.
+    """
+
+    def __init__(self, max_pending: int = 256):
+        self.max_pending = max_pending
+        self.channels: Dict[WebSocket, ClientChannel] = {}
+        self.topics: Dict[str, Set[WebSocket]] = defaultdict(set)
+        self.subscriptions: Dict[WebSocket, Set[str]] = {}
+        self.firehose: Set[WebSocket] = set()  # clients without subscriptions
+        self.overflow_disconnects = 0
+
+    @property
+    def active_connections(self) -> List[WebSocket]:
+        return list(self.channels)
+
+    def is_connected(self, websocket: WebSocket) -> bool:
+        """False once the manager dropped the client (send error or overflow)"""
+        return websocket in self.channels
+
+    async def connect(self, websocket: WebSocket):
+        await websocket.accept()
+        channel = ClientChannel(websocket, self.max_pending)
+        channel.task = asyncio.create_task(self._write(channel))
+        self.channels[websocket] = channel
+        self.subscriptions[websocket] = set()
+        self.firehose.add(websocket)
+        logger.info("✅ WebSocket connected. Total: %d", len(self.channels))
+
+    async def _write(self, channel: ClientChannel):
+        try:
+            await channel.run()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Send error: {e}")
+            self.disconnect(channel.websocket)
+
+    def disconnect(self, websocket: WebSocket):
+        channel = self.channels.pop(websocket, None)
+        if channel is None:
+            return
+        if channel.task and channel.task is not asyncio.current_task():
+            channel.task.cancel()
+        self.firehose.discard(websocket)
+        for topic in self.subscriptions.pop(websocket, ()):
+            self._drop(topic, websocket)
+        logger.info("❌ WebSocket disconnected. Total: %d", len(self.channels))
+
+    def _drop(self, topic: str, websocket: WebSocket):
+        subscribers = self.topics.get(topic)
+        if subscribers is not None:
+            subscribers.discard(websocket)
+            if not subscribers:
+                del self.topics[topic]
+
+    def subscribe(self, websocket: WebSocket, topics: List[str]):
+        if websocket not in self.channels:
+            return
+        for topic in topics:
+            self.topics[topic].add(websocket)
+            self.subscriptions[websocket].add(topic)
+        self.firehose.discard(websocket)
+
+    def unsubscribe(self, websocket: WebSocket, topics: List[str]):
+        if websocket not in self.channels:
+            return
+        for topic in topics:
+            self.subscriptions[websocket].discard(topic)
+            self._drop(topic, websocket)
+        if not self.subscriptions[websocket]:
+            self.firehose.add(websocket)
+
+    def handle_client_message(self, websocket: WebSocket, text: str) -> dict | None:
+        """Apply a {"action": "subscribe"|"unsubscribe", "surgeon"|"theater"|"surgery_id": ...} request"""
+        if websocket not in self.channels:
+            return None  # already dropped; the endpoint closes it
+        try:
+            request = json.loads(text)
+        except json.JSONDecodeError:
+            return None  # plain keep-alive pings
+        if not isinstance(request, dict) or request.get("action") not in ("subscribe", "unsubscribe"):
+            return {"type": "error", "detail": "expected subscribe/unsubscribe action"}
+
+        topics = []
+        for kind in TOPIC_FIELDS:
+            values = request.get(kind)
+            if values is None:
+                continue
+            for value in values if isinstance(values, list) else [values]:
+                topics.append(_topic(kind, value))
+        if not topics:
+            return {"type": "error", "detail": f"expected one of {', '.join(TOPIC_FIELDS)}"}
+
+        if request["action"] == "subscribe":
+            self.subscribe(websocket, topics)
+        else:
+            self.unsubscribe(websocket, topics)
+        return {"type": "subscriptions", "topics": sorted(self.subscriptions[websocket])}
+
+    def recipients(self, message: dict) -> Set[WebSocket]:
+        targets = set(self.firehose)
+        for topic in message_topics(message):
+            targets.update(self.topics.get(topic, ()))
+        return targets
+
+    def send(self, websocket: WebSocket, message: dict):
+        """Queue a message for a single client"""
+        self._enqueue([websocket], message)
+
+    async def broadcast(self, message: dict):
+        recipients = self.recipients(message)
+        logger.info("📡 Broadcasting (%s) to %d clients", message.get("type"), len(recipients))
+        self._enqueue(recipients, message)
+
+    def _enqueue(self, websockets, message: dict):
+        if not websockets:
+            return
+        text = json.dumps(message, default=str)
+        message_type, surgery_id = message.get("type"), message.get("surgery_id")
+        for websocket in websockets:
+            channel = self.channels.get(websocket)
+            if channel and not channel.enqueue(message_type, surgery_id, text):
+                logger.warning(f"Client {channel.stats()['client']} fell too far behind – disconnecting")
+                self.overflow_disconnects += 1
+                self.disconnect(websocket)
+                asyncio.create_task(self.close(websocket))
+
+    async def close(self, websocket: WebSocket):
+        """Close a dropped client; it may already be gone"""
+        try:
+            await websocket.close(code=1013)  # try again later
+        except Exception:
+            pass
+
+    def stats(self) -> dict:
+        clients = [channel.stats() for channel in self.channels.values()]
+        return {
+            "clients": len(clients),
+            "topics": len(self.topics),
+            "max_pending": self.max_pending,
+            "pending_total": sum(c["pending"] for c in clients),
+            "pending_max": max((c["pending"] for c in clients), default=0),
+            "coalesced": sum(c["coalesced"] for c in clients),
+            "dropped": sum(c["dropped"] for c in clients),
+            "overflow_disconnects": self.overflow_disconnects,
+            "per_client": clients,
+        }
@@ -1,12 +1,100 @@
 import sqlite3
+import asyncio
 import aiosqlite
+from collections import deque
+from contextlib import asynccontextmanager
 from pathlib import Path
+from time import perf_counter
 from config import DB_PATH
+from catalog import catalog_key
 
-def init_db():
+def init_db(path: Path = DB_PATH):
     """Initialize the SQLite database"""
-    conn = sqlite3.connect(DB_PATH)
+    conn = sqlite3.connect(path)
+    conn.create_function("catalog_key", 1, catalog_key, deterministic=True)
     cursor = conn.cursor()
+    _init_surgeries(cursor)
+
+    # Canonical surgeon/procedure/instrument names with integer ids; the name
+    # columns stay on surgeries for full-text search and the API, lookups and
+    # indexes go through the ids
+    cursor.executescript("""
+        CREATE TABLE IF NOT EXISTS catalog (
+            id INTEGER PRIMARY KEY,
+            kind TEXT NOT NULL,
+            name TEXT NOT NULL,
+            key TEXT NOT NULL,
+            UNIQUE (kind, key)
+        );
+
+        CREATE TABLE IF NOT EXISTS catalog_aliases (
+            kind TEXT NOT NULL,
+            alias_key TEXT NOT NULL,
+            catalog_id INTEGER NOT NULL REFERENCES catalog (id),
+            PRIMARY KEY (kind, alias_key)
+        );
+    """)
+    _backfill_catalog_ids(cursor)
+
+    # Parser state per watched log, so a restart resumes instead of reparsing
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS ingest_checkpoints (
+            path TEXT PRIMARY KEY,
+            surgery_id INTEGER,
+            surgeon_name TEXT,
+            parser_state TEXT NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    # Quantile sketches of completed surgeries per surgeon, procedure and
+    # metric ("duration", "clutch_rate", "instrument:<catalog id>")
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS surgery_sketches (
+            surgeon_id INTEGER NOT NULL,
+            procedure_id INTEGER NOT NULL,
+            metric TEXT NOT NULL,
+            sketch BLOB NOT NULL,
+            PRIMARY KEY (surgeon_id, procedure_id, metric)
+        ) WITHOUT ROWID
+    """)
+
+    # Theater shards (see sharding.py): the number fixes the shard's id range
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS shards (
+            number INTEGER PRIMARY KEY AUTOINCREMENT,
+            key TEXT NOT NULL UNIQUE,
+            theater TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    
+    conn.commit()
+    conn.close()
+    print(f"✅ Database initialized at: {path}")
+
+def init_shard_db(path: Path, first_id: int):
+    """A theater shard: the surgeries table alone, with ids starting after `first_id`"""
+    conn = sqlite3.connect(path)
+    cursor = conn.cursor()
+    _init_surgeries(cursor)
+    cursor.execute("""
+        INSERT INTO sqlite_sequence (name, seq) SELECT 'surgeries', ?
+        WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = 'surgeries')
+    """, (first_id,))
+    conn.commit()
+    conn.close()
+
+def _init_surgeries(cursor):
+    """The surgeries table with its indexes, full-text index and version counters"""
+    # Incremental auto-vacuum lets the retention job hand archived pages back
+    # to the filesystem; switching an existing file needs a one-off VACUUM
+    if cursor.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+        cursor.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        cursor.execute("VACUUM")
+
+    # WAL lets the reader pool keep serving while the ingest writer commits
+    cursor.execute("PRAGMA journal_mode = WAL")
     
     cursor.execute("""
         CREATE TABLE IF NOT EXISTS surgeries (
@@ -21,16 +109,282 @@ def init_db():
             instruments_durations TEXT,
             clutch_count INTEGER DEFAULT 0,
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            is_live INTEGER DEFAULT 0
+            is_live INTEGER DEFAULT 0,
+            surgeon_id INTEGER,
+            procedure_id INTEGER,
+            instrument_ids TEXT,
+            clutch_offsets BLOB
         )
     """)
-    
-    conn.commit()
-    conn.close()
-    print(f"✅ Database initialized at: {DB_PATH}")
 
-async def get_db():
-    """Get async database connection"""
-    db = await aiosqlite.connect(DB_PATH)
-    db.row_factory = aiosqlite.Row
-    return db
\ No newline at end of file
+    columns = {row[1] for row in cursor.execute("PRAGMA table_info(surgeries)")}
+    for column, column_type in (
+        ("surgeon_id", "INTEGER"), ("procedure_id", "INTEGER"), ("instrument_ids", "TEXT"),
+        ("clutch_offsets", "BLOB"),  # packed press times, see clutch_series.py
+    ):
+        if column not in columns:
+            cursor.execute(f"ALTER TABLE surgeries ADD COLUMN {column} {column_type}")
+    cursor.executescript("""
+        DROP INDEX IF EXISTS idx_surgeries_surgeon_created;
+        DROP INDEX IF EXISTS idx_surgeries_live;
+        CREATE INDEX IF NOT EXISTS idx_surgeries_surgeon_id_created
+        ON surgeries (surgeon_id, created_at);
+        CREATE INDEX IF NOT EXISTS idx_surgeries_procedure_id ON surgeries (procedure_id);
+        CREATE INDEX IF NOT EXISTS idx_surgeries_date ON surgeries (date);
+        CREATE INDEX IF NOT EXISTS idx_surgeries_duration ON surgeries (duration);
+        CREATE INDEX IF NOT EXISTS idx_surgeries_live_surgeon_id
+        ON surgeries (surgeon_id) WHERE is_live = 1;
+    """)
+
+    # Full-text index over the descriptive columns, kept in sync by triggers.
+    # Live updates set the indexed columns to the values they already hold;
+    # UPDATE OF fires on any column in the SET list, so the update trigger
+    # also compares values and leaves the FTS row alone unless one changed.
+    # Recreated so databases carrying the older, unconditional trigger pick it up.
+    fts_exists = cursor.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'surgeries_fts'"
+    ).fetchone()
+    cursor.executescript("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS surgeries_fts USING fts5(
+            procedure_name, surgeon_name, patient_info,
+            content = 'surgeries', content_rowid = 'id',
+            tokenize = 'unicode61 remove_diacritics 2'
+        );
+
+        CREATE TRIGGER IF NOT EXISTS surgeries_fts_insert AFTER INSERT ON surgeries
+        BEGIN
+            INSERT INTO surgeries_fts (rowid, procedure_name, surgeon_name, patient_info)
+            VALUES (NEW.id, NEW.procedure_name, NEW.surgeon_name, NEW.patient_info);
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS surgeries_fts_delete AFTER DELETE ON surgeries
+        BEGIN
+            INSERT INTO surgeries_fts (surgeries_fts, rowid, procedure_name, surgeon_name, patient_info)
+            VALUES ('delete', OLD.id, OLD.procedure_name, OLD.surgeon_name, OLD.patient_info);
+        END;
+
+        DROP TRIGGER IF EXISTS surgeries_fts_update;
+        CREATE TRIGGER surgeries_fts_update
+        AFTER UPDATE OF procedure_name, surgeon_name, patient_info ON surgeries
+        WHEN OLD.procedure_name IS NOT NEW.procedure_name
+          OR OLD.surgeon_name IS NOT NEW.surgeon_name
+          OR OLD.patient_info IS NOT NEW.patient_info
+        BEGIN
+            INSERT INTO surgeries_fts (surgeries_fts, rowid, procedure_name, surgeon_name, patient_info)
+            VALUES ('delete', OLD.id, OLD.procedure_name, OLD.surgeon_name, OLD.patient_info);
+            INSERT INTO surgeries_fts (rowid, procedure_name, surgeon_name, patient_info)
+            VALUES (NEW.id, NEW.procedure_name, NEW.surgeon_name, NEW.patient_info);
+        END;
+    """)
+    if not fts_exists:
+        cursor.execute("INSERT INTO surgeries_fts (surgeries_fts) VALUES ('rebuild')")
+
+    # Per-surgeon data version, bumped by triggers on every write – backs the
+    # history ETag so a conditional GET costs one primary-key lookup. Keyed by
+    # surgeon id, as history is, so every stored spelling bumps the same
+    # counter; the name-keyed table of older databases is replaced.
+    versions_by_name = "surgeon_name" in [
+        row[1] for row in cursor.execute("PRAGMA table_info(surgeon_versions)").fetchall()
+    ]
+    if versions_by_name:
+        cursor.executescript("""
+            DROP TRIGGER IF EXISTS surgeries_version_insert;
+            DROP TRIGGER IF EXISTS surgeries_version_update;
+            DROP TRIGGER IF EXISTS surgeries_version_delete;
+            DROP TABLE surgeon_versions;
+        """)
+    cursor.executescript("""
+        CREATE TABLE IF NOT EXISTS surgeon_versions (
+            surgeon_id INTEGER PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        );
+
+        CREATE TRIGGER IF NOT EXISTS surgeries_version_insert AFTER INSERT ON surgeries
+        WHEN NEW.surgeon_id IS NOT NULL
+        BEGIN
+            INSERT INTO surgeon_versions (surgeon_id, version) VALUES (NEW.surgeon_id, 1)
+            ON CONFLICT(surgeon_id) DO UPDATE SET version = version + 1;
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS surgeries_version_update AFTER UPDATE ON surgeries
+        BEGIN
+            INSERT INTO surgeon_versions (surgeon_id, version)
+            SELECT NEW.surgeon_id, 1 WHERE NEW.surgeon_id IS NOT NULL
+            ON CONFLICT(surgeon_id) DO UPDATE SET version = version + 1;
+            UPDATE surgeon_versions SET version = version + 1
+            WHERE surgeon_id = OLD.surgeon_id AND OLD.surgeon_id IS NOT NEW.surgeon_id;
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS surgeries_version_delete AFTER DELETE ON surgeries
+        BEGIN
+            UPDATE surgeon_versions SET version = version + 1 WHERE surgeon_id = OLD.surgeon_id;
+        END;
+    """)
+
+def _backfill_catalog_ids(cursor):
+    """Give rows written before the catalog existed their surgeon/procedure/instrument ids"""
+    for kind, column in (("surgeon", "surgeon_name"), ("procedure", "procedure_name")):
+        cursor.execute(f"""
+            INSERT OR IGNORE INTO catalog (kind, name, key)
+            SELECT '{kind}', TRIM({column}), catalog_key({column}) FROM surgeries
+            WHERE {kind}_id IS NULL AND catalog_key({column}) != ''
+            ORDER BY id
+        """)
+        cursor.execute(f"""
+            UPDATE surgeries SET {kind}_id = (
+                SELECT id FROM catalog WHERE kind = '{kind}' AND key = catalog_key(surgeries.{column})
+            ) WHERE {kind}_id IS NULL
+        """)
+
+    rows = cursor.execute(
+        "SELECT id, instruments_names FROM surgeries WHERE instrument_ids IS NULL AND instruments_names != ''"
+    ).fetchall()
+    for surgery_id, names in rows:
+        ids = []
+        for name in names.split(","):
+            key = catalog_key(name)
+            if not key:
+                continue
+            cursor.execute(
+                "INSERT OR IGNORE INTO catalog (kind, name, key) VALUES ('instrument', ?, ?)", (name.strip(), key)
+            )
+            ids.append(str(cursor.execute(
+                "SELECT id FROM catalog WHERE kind = 'instrument' AND key = ?", (key,)
+            ).fetchone()[0]))
+        cursor.execute("UPDATE surgeries SET instrument_ids = ? WHERE id = ?", (",".join(ids), surgery_id))
+
+async def get_surgeon_version(db, surgeon_id: int) -> int:
+    cursor = await db.execute(
+        "SELECT version FROM surgeon_versions WHERE surgeon_id = ?", (surgeon_id,)
+    )
+    row = await cursor.fetchone()
+    return row[0] if row else 0
+
+
+# ========================================
+# SPLIT READ / WRITE ACCESS
+# ========================================
+class WaitStats:
+    """How long callers queued for a connection (seconds)"""
+
+    def __init__(self, window: int = 1024):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._recent = deque(maxlen=window)
+
+    def record(self, wait: float):
+        self.count += 1
+        self.total += wait
+        self.max = max(self.max, wait)
+        self._recent.append(wait)
+
+    def as_dict(self) -> dict:
+        recent = sorted(self._recent)
+        def pct(p):
+            return round(recent[min(len(recent) - 1, int(p * len(recent)))] * 1000, 3) if recent else 0.0
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total / self.count * 1000, 3) if self.count else 0.0,
+            "p50_ms": pct(0.50),
+            "p99_ms": pct(0.99),
+            "max_ms": round(self.max * 1000, 3),
+        }
+
+
+class DatabaseWriter:
+    """The one connection that writes; callers queue for it in turn.
+
+    Serialising writes in-process keeps them from fighting over SQLite's
+    write lock, and the short transactions keep WAL readers unblocked.
+    """
+
+    def __init__(self, path: Path = DB_PATH):
+        self.path = path
+        self._db: aiosqlite.Connection | None = None
+        self._lock = asyncio.Lock()
+        self.wait = WaitStats()
+        self.hold = WaitStats()
+
+    async def open(self):
+        if self._db is None:
+            self._db = await aiosqlite.connect(self.path)
+            self._db.row_factory = aiosqlite.Row
+            await self._db.execute("PRAGMA synchronous = NORMAL")
+            await self._db.execute("PRAGMA busy_timeout = 5000")
+
+    @asynccontextmanager
+    async def transaction(self):
+        queued = perf_counter()
+        async with self._lock:
+            started = perf_counter()
+            self.wait.record(started - queued)
+            await self.open()
+            try:
+                yield self._db
+                await self._db.commit()
+            except BaseException:
+                await self._db.rollback()
+                raise
+            finally:
+                self.hold.record(perf_counter() - started)
+
+    async def close(self):
+        if self._db is not None:
+            await self._db.close()
+            self._db = None
+
+    def stats(self) -> dict:
+        return {"queue_wait": self.wait.as_dict(), "transaction": self.hold.as_dict()}
+
+
+class ReaderPool:
+    """Read-only WAL connections for HTTP and WebSocket snapshot queries.
+
+    Connections are opened lazily up to `size` and reused; a caller waits
+    only when all of them are busy.
+    """
+
+    def __init__(self, path: Path = DB_PATH, size: int = 4):
+        self.path = path
+        self.size = size
+        self._idle: asyncio.Queue = asyncio.Queue()
+        self._opened = 0
+        self.wait = WaitStats()
+
+    async def _connect(self) -> aiosqlite.Connection:
+        db = await aiosqlite.connect(f"file:{self.path}?mode=ro", uri=True)
+        db.row_factory = aiosqlite.Row
+        await db.execute("PRAGMA busy_timeout = 5000")
+        return db
+
+    @asynccontextmanager
+    async def acquire(self):
+        queued = perf_counter()
+        if self._idle.empty() and self._opened < self.size:
+            self._opened += 1
+            try:
+                db = await self._connect()
+            except BaseException:
+                self._opened -= 1
+                raise
+        else:
+            db = await self._idle.get()
+        self.wait.record(perf_counter() - queued)
+        try:
+            yield db
+        finally:
+            self._idle.put_nowait(db)
+
+    async def close(self):
+        while not self._idle.empty():
+            await self._idle.get_nowait().close()
+        self._opened = 0
+
+    def stats(self) -> dict:
+        return {
+            "size": self.size,
+            "open": self._opened,
+            "idle": self._idle.qsize(),
+            "queue_wait": self.wait.as_dict(),
+        }
@@ -0,0 +1,176 @@
+import io
+import csv
+import json
+from pathlib import Path
+from typing import AsyncIterator, Callable, Dict, List, Tuple
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # optional – only needed for format=parquet
+    pa = pq = None
+
+from database import ReaderPool
+from retention import archive_files
+
+FORMATS = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+COLUMNS = [
+    "id", "procedure_name", "date", "time", "duration", "surgeon_name", "patient_info",
+    "clutch_count", "created_at", "is_live", "instruments_names", "instruments_durations",
+]
+
+
+def parquet_available() -> bool:
+    return pa is not None
+
+
+def _instruments(row, canonical: Callable[[str], str]) -> Dict[str, float]:
+    """Instrument → minutes, with every spelling folded into its canonical name"""
+    names = row["instruments_names"].split(",") if row["instruments_names"] else []
+    durations = row["instruments_durations"].split(",") if row["instruments_durations"] else []
+    minutes: Dict[str, float] = {}
+    for name, value in zip(names, durations):
+        if value:
+            name = canonical(name)
+            minutes[name] = minutes.get(name, 0.0) + float(value)
+    return minutes
+
+
+# ========================================
+# ROW SOURCE
+# ========================================
+async def _batches(pool, table: str, where: str, params: list, batch_size: int) -> AsyncIterator[list]:
+    """Keyset pages in id order. Each page is one short query on a reader
+    acquired just for it, so nothing stays checked out or open while the
+    client is still downloading the previous page."""
+    last_id = None
+    while True:
+        page_where, page_params = (where, params) if last_id is None else (f"({where}) AND id > ?", params + [last_id])
+        async with pool.acquire() as db:
+            cursor = await db.execute(
+                f"SELECT {', '.join(COLUMNS)} FROM {table} WHERE {page_where} ORDER BY id LIMIT ?",
+                page_params + [batch_size],
+            )
+            rows = await cursor.fetchall()
+        if rows:
+            yield rows
+        if len(rows) < batch_size:
+            return
+        last_id = rows[-1]["id"]
+
+
+async def row_batches(pool, where: str, params: list, batch_size: int,
+                      archive_dir: Path | None = None, archived: Tuple[str, list] | None = None,
+                      legacy: Tuple[str, list] | None = None) -> AsyncIterator[list]:
+    """Matching rows in fixed-size batches from the hot table behind `pool`,
+    then (when `archive_dir` is given) each monthly archive, newest first.
+
+    `archived` and `legacy` are (where, params) filters for the archives,
+    defaulting to the hot one; `legacy` applies to archives last written
+    before the catalog, whose tables have no surgeon_id column. Archives
+    are read through a connection of their own, not one from `pool`.
+    """
+    async for rows in _batches(pool, "surgeries", where, params, batch_size):
+        yield rows
+    if archive_dir is None:
+        return
+    archived = archived or (where, params)
+    for path in archive_files(archive_dir):
+        archive = ReaderPool(path, size=1)
+        try:
+            async with archive.acquire() as db:
+                cursor = await db.execute("PRAGMA table_info(surgeries)")
+                has_ids = any(column[1] == "surgeon_id" for column in await cursor.fetchall())
+            archive_where, archive_params = archived if has_ids or legacy is None else legacy
+            async for rows in _batches(archive, "surgeries", archive_where, archive_params, batch_size):
+                yield rows
+        finally:
+            await archive.close()
+
+
+# ========================================
+# ENCODERS
+# ========================================
+def _instrument_column(name: str) -> str:
+    return f"instrument:{name}"
+
+
+async def encode_csv(batches: AsyncIterator[list], instruments: List[str],
+                     canonical: Callable[[str], str]) -> AsyncIterator[bytes]:
+    """One minutes column per known instrument after the surgery columns"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(COLUMNS + [_instrument_column(name) for name in instruments])
+    yield buffer.getvalue().encode()
+    async for rows in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        for row in rows:
+            minutes = _instruments(row, canonical)
+            writer.writerow([row[c] for c in COLUMNS] + [minutes.get(name, "") for name in instruments])
+        yield buffer.getvalue().encode()
+
+
+async def encode_ndjson(batches: AsyncIterator[list], canonical: Callable[[str], str]) -> AsyncIterator[bytes]:
+    async for rows in batches:
+        yield "".join(
+            json.dumps({**{c: row[c] for c in COLUMNS}, "is_live": bool(row["is_live"]),
+                        "instruments": _instruments(row, canonical)}, default=str) + "\n"
+            for row in rows
+        ).encode()
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file that hands its bytes over in chunks. tell() keeps
+    counting across drains, since the Parquet footer records file offsets."""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+async def encode_parquet(batches: AsyncIterator[list], instruments: List[str],
+                         canonical: Callable[[str], str]) -> AsyncIterator[bytes]:
+    """One row group per batch; bytes are handed on as soon as each group is written"""
+    fields = [
+        ("id", pa.int64()), ("procedure_name", pa.string()), ("date", pa.string()), ("time", pa.string()),
+        ("duration", pa.int64()), ("surgeon_name", pa.string()), ("patient_info", pa.string()),
+        ("clutch_count", pa.int64()), ("created_at", pa.string()), ("is_live", pa.bool_()),
+        ("instruments_names", pa.string()), ("instruments_durations", pa.string()),
+    ]
+    schema = pa.schema(fields + [(_instrument_column(name), pa.float64()) for name in instruments])
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema)
+    try:
+        async for rows in batches:
+            expanded = [_instruments(row, canonical) for row in rows]
+            columns = {c: [row[c] for row in rows] for c in COLUMNS}
+            columns["is_live"] = [bool(v) for v in columns["is_live"]]
+            for name in instruments:
+                columns[_instrument_column(name)] = [minutes.get(name) for minutes in expanded]
+            writer.write_table(pa.Table.from_pydict(columns, schema=schema))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
@@ -0,0 +1,162 @@
+import os
+import json
+from typing import Any, Dict, List, NamedTuple, Tuple
+
+from surgery_parser import SurgeryParser
+
+# Blocking readers for watched logs. They seek to the region actually needed
+# and read only that; call them through a thread (or process) executor, never
+# on the loop. Logs are never memory-mapped: producers truncate them in place
+# (open(path, "w")), and touching a mapped page past the new end is a SIGBUS
+# that takes the whole server down.
+
+GUARD_BYTES = 64  # bytes either side of the old array end that must be unchanged
+
+
+class LogStat(NamedTuple):
+    """What changes whenever a log is rewritten, appended to or replaced"""
+    inode: int
+    size: int
+    mtime_ns: int
+
+
+def _log_stat(st: os.stat_result) -> LogStat:
+    return LogStat(st.st_ino, st.st_size, st.st_mtime_ns)
+
+
+def stat_log(path: str) -> LogStat | None:
+    try:
+        return _log_stat(os.stat(path))
+    except FileNotFoundError:
+        return None
+
+
+# ========================================
+# JSON ARRAY LOGS
+# ========================================
+class ArrayCursor(NamedTuple):
+    """Where a decoded JSON array log ended, to pick up only what is appended"""
+    end: int  # just past the last event, before the closing "]"
+    head: bytes  # first GUARD_BYTES of the file
+    tail: bytes  # GUARD_BYTES before `end`
+
+
+class ArrayRead(NamedTuple):
+    stat: LogStat
+    events: Any  # decoded log, or only the new events when `appended`; None if empty or too large
+    cursor: ArrayCursor | None
+    appended: bool
+
+
+def _array_cursor(head: bytes, buf: bytes, base: int = 0) -> ArrayCursor | None:
+    """Cursor from the file's first bytes and its content from offset `base` on"""
+    close = buf.rfind(b"]")
+    if close < 0:
+        return None
+    end = close
+    while end > 0 and buf[end - 1: end].isspace():
+        end -= 1
+    if base and end < GUARD_BYTES:
+        return None  # the region read does not reach back far enough
+    return ArrayCursor(base + end, head[:GUARD_BYTES], buf[max(0, end - GUARD_BYTES): end])
+
+
+def _appended(f, cursor: ArrayCursor) -> Tuple[List[Any], ArrayCursor | None] | None:
+    """(events after `cursor`, new cursor) if the file is the same array with
+    more events, else None. Reads the first bytes and everything from just
+    before the old end."""
+    head = f.read(GUARD_BYTES)
+    base = max(0, cursor.end - GUARD_BYTES)
+    f.seek(base)
+    buf = f.read()
+    if head != cursor.head or buf[: cursor.end - base] != cursor.tail:
+        return None
+    rest = buf[cursor.end - base:].strip()
+    if rest == b"]":
+        return [], _array_cursor(head, buf, base)
+    if not rest.startswith(b","):
+        return None
+    return json.loads(b"[" + rest[1:]), _array_cursor(head, buf, base)
+
+
+def read_json_array(path: str, cursor: ArrayCursor | None = None, max_full_bytes: int | None = None) -> ArrayRead:
+    """Decode a JSON array log, or with `cursor` only the events appended since.
+
+    Producers rewrite the whole array (often through a temp file and a
+    rename), so growth is recognised by content: the first bytes and the
+    bytes up to the old end must be unchanged. Anything else is a full
+    decode – skipped, with events None, when the file exceeds `max_full_bytes`.
+    """
+    with open(path, "rb") as f:
+        stat = _log_stat(os.fstat(f.fileno()))
+        if stat.size == 0:
+            return ArrayRead(stat, None, None, False)
+        if cursor is not None and stat.size > cursor.end:
+            appended = _appended(f, cursor)
+            if appended is not None:
+                return ArrayRead(stat, appended[0], appended[1], True)
+        if max_full_bytes is not None and stat.size > max_full_bytes:
+            return ArrayRead(stat, None, None, False)
+        f.seek(0)
+        buf = f.read()
+        data = json.loads(buf)
+        return ArrayRead(stat, data, _array_cursor(buf, buf), False)
+
+
+def parse_json_log(path: str, state: Dict[str, Any] | None = None) -> Tuple[ArrayRead, Dict[str, Any] | None]:
+    """Decode and parse a whole log, continuing `state` when the log only grew.
+
+    Meant to run in a worker process: it reads the file itself, so the log
+    never crosses the process boundary, and hands back only the compact
+    parser state (the read comes back with its events stripped). The state
+    is None for anything that is not a non-empty event list.
+    """
+    read = read_json_array(path)
+    data = read.events
+    read = read._replace(events=None)
+    if not isinstance(data, list) or not data:
+        return read, None
+    parser = SurgeryParser.from_state(state) if state else SurgeryParser()
+    if not parser.resumes(data):
+        parser = SurgeryParser()
+    return read, parser.feed(data[parser.events_seen:]).to_state()
+
+
+# ========================================
+# NDJSON LOGS
+# ========================================
+class LineRead(NamedTuple):
+    stat: LogStat
+    first_event: Any  # the log's first event, to tell a replaced log from a grown one
+    events: List[Any]
+    start: int  # offset the lines were read from (0 after a truncation)
+    consumed: int  # offset just past the last complete line
+    malformed: List[str]
+
+
+def read_ndjson(path: str, offset: int = 0) -> LineRead:
+    """Complete lines from `offset` on; a half-written last line waits for the next read"""
+    with open(path, "rb") as f:
+        stat = _log_stat(os.fstat(f.fileno()))
+        if stat.size < offset:
+            offset = 0  # truncated
+        if stat.size == 0:
+            return LineRead(stat, None, [], 0, 0, [])
+        first_event = None
+        if offset:
+            try:
+                first_event = json.loads(f.readline())
+            except json.JSONDecodeError:
+                pass
+        f.seek(offset)
+        buf = f.read()
+    complete = buf.rfind(b"\n") + 1
+    events, malformed = [], []
+    for line in buf[:complete].split(b"\n"):
+        if not line.strip():
+            continue
+        try:
+            events.append(json.loads(line))
+        except json.JSONDecodeError as e:
+            malformed.append(str(e))
+    return LineRead(stat, first_event, events, offset, offset + complete, malformed)
@@ -0,0 +1,155 @@
+import sys
+import json
+import time
+import queue
+import atexit
+import logging
+import threading
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Tuple
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """Hands records to the writer thread without formatting or waiting.
+
+    The stock QueueHandler formats every record in the caller so it can be
+    pickled; our listener is a thread in the same process, so the record is
+    passed through as-is and `%` arguments are only rendered by the writer.
+    When the queue is full the record is dropped and counted instead of
+    stalling the event loop.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class RateLimitFilter(logging.Filter):
+    """Lets through at most `burst` INFO/DEBUG records per message template
+    and `window` seconds; warnings and errors always pass.
+
+    Records are keyed on the unformatted message, so this only groups calls
+    that use lazy `%` arguments. The first record after a suppressed run
+    carries the number of records it stands for.
+    """
+
+    def __init__(self, burst: int = 5, window: float = 10.0):
+        super().__init__()
+        self.burst = burst
+        self.window = window
+        self._buckets: Dict[Tuple[str, str], list] = {}  # key → [window start, count, suppressed]
+        self._lock = threading.Lock()
+        self._pruned = time.monotonic()
+        self.suppressed = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or self.burst <= 0:
+            return True
+        key = (record.name, str(record.msg))
+        now = time.monotonic()
+        with self._lock:
+            if now - self._pruned >= self.window:
+                self._prune(now)
+            bucket = self._buckets.get(key)
+            if bucket is None or now - bucket[0] >= self.window:
+                suppressed = bucket[2] if bucket else 0
+                self._buckets[key] = [now, 1, 0]
+                if suppressed:
+                    record.suppressed = suppressed
+                return True
+            if bucket[1] < self.burst:
+                bucket[1] += 1
+                return True
+            bucket[2] += 1
+            self.suppressed += 1
+            return False
+
+    def _prune(self, now: float):
+        # A bucket whose window has closed says nothing new; one with a
+        # suppressed count is kept one window longer so its next record can
+        # still report it. Bounds the dict by the messages of the last windows.
+        self._buckets = {
+            key: bucket for key, bucket in self._buckets.items()
+            if now - bucket[0] < (2 * self.window if bucket[2] else self.window)
+        }
+        self._pruned = now
+
+
+class TextFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        text = super().format(record)
+        suppressed = getattr(record, "suppressed", 0)
+        return f"{text} (+{suppressed} similar suppressed)" if suppressed else text
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        if getattr(record, "suppressed", 0):
+            entry["suppressed"] = record.suppressed
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+_handler: NonBlockingQueueHandler | None = None
+_limiter: RateLimitFilter | None = None
+_listener: QueueListener | None = None
+
+
+def stop_logging():
+    """Flush queued records and stop the writer thread; safe to call twice"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def setup_logging(level: str = "INFO", fmt: str = "text", burst: int = 5, window: float = 10.0,
+                  max_queue: int = 10000) -> QueueListener:
+    """Route all logging through a queue drained by a background writer thread"""
+    global _handler, _limiter, _listener
+    stop_logging()
+    log_queue: queue.Queue = queue.Queue(maxsize=max_queue)
+
+    stream = logging.StreamHandler(sys.stderr)
+    stream.setFormatter(JsonFormatter() if fmt == "json" else TextFormatter(TEXT_FORMAT))
+    listener = QueueListener(log_queue, stream, respect_handler_level=True)
+    listener.start()
+    _listener = listener
+
+    _handler = NonBlockingQueueHandler(log_queue)
+    _limiter = RateLimitFilter(burst, window)
+    _handler.addFilter(_limiter)
+
+    root = logging.getLogger()
+    root.handlers = [_handler]
+    root.setLevel(level)
+    return listener
+
+
+atexit.register(stop_logging)
+
+
+def logging_stats() -> dict:
+    return {
+        "queued": _handler.queue.qsize() if _handler else 0,
+        "dropped": _handler.dropped if _handler else 0,
+        "suppressed": _limiter.suppressed if _limiter else 0,
+    }
@@ -2,30 +2,60 @@ import os
 import json
 import asyncio
 import logging
-from datetime import datetime
-from typing import List, Dict, Any
+import re
+from datetime import date, datetime
+from typing import List, Dict, Any, Set
 from pathlib import Path
 import threading
 import shutil
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import hashlib
+import time
 
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, HTTPException, Query, Request, Response, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
 
 # Assuming these exist in your project
-from database import init_db, get_db
-from config import WATCH_FOLDER, HOST, PORT
+from database import init_db, get_surgeon_version, DatabaseWriter, ReaderPool
+from config import (
+    WATCH_FOLDER, HOST, PORT, WORKERS,
+    LEADER_LOCK_PATH, PUBSUB_SOCKET_PATH, LEADER_RETRY_INTERVAL, LIVE_TICK_INTERVAL,
+    WS_MAX_PENDING, GZIP_MINIMUM_SIZE, ALERT_RULES, ALERT_RULES_JSON,
+    LOG_LEVEL, LOG_FORMAT, LOG_RATE_BURST, LOG_RATE_WINDOW, LOG_QUEUE_SIZE,
+    DB_PATH, PUBLIC_FOLDER, ARCHIVE_DB_FOLDER, RETENTION_DAYS, RETENTION_INTERVAL,
+    WATCH_STATE_MAX_ENTRIES, WATCH_STATE_TTL, LOG_DEBOUNCE_SECONDS,
+    READER_POOL_SIZE, SHARDING, SHARD_FOLDER, TRACING_ENABLED, SLOW_OPS_PER_STAGE,
+    CLUTCH_SERIES_MAX_POINTS, EXPORT_BATCH_SIZE, PARSE_INLINE_MAX_BYTES, PARSE_HUGE_BYTES, PARSE_POOL_WORKERS,
+)
+from catalog import KINDS, Catalog, catalog_key
+from sketches import QuantileSketch, SketchStore
+from anomalies import AnomalyDetector, merge_rules
+from export import FORMATS, parquet_available, row_batches, encode_csv, encode_ndjson, encode_parquet
+from clutch_series import pack_offsets, unpack_offsets, histogram, rolling_rate
+from cluster import ClusterNode
+from connections import ConnectionManager
+from ticker import LiveClock
+from surgery_parser import SurgeryParser, update_digest
+from log_reader import ArrayCursor, ArrayRead, stat_log, read_json_array, read_ndjson, parse_json_log
+from retention import fetch_from_archives, run_retention
+from sharding import ShardRouter
+from state_store import StateStore
+from tracing import Tracer, LoopLagMonitor, sample_thread
+from logging_setup import setup_logging, logging_stats
 
 # ========================================
 # LOGGER + DATABASE + ARCHIVE
 # ========================================
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+setup_logging(LOG_LEVEL, LOG_FORMAT, LOG_RATE_BURST, LOG_RATE_WINDOW, LOG_QUEUE_SIZE)
 logger = logging.getLogger(__name__)
-init_db()
+
+LOG_SUFFIXES = {".json", ".ndjson"}  # whole-array logs and append-only event-per-line logs
 
 ARCHIVE_FOLDER = WATCH_FOLDER.parent / "completed_surgeries"
 ARCHIVE_FOLDER.mkdir(exist_ok=True)
@@ -33,6 +63,22 @@ ARCHIVE_FOLDER.mkdir(exist_ok=True)
 # ========================================
 # FASTAPI + CORS
 # ========================================
+class GZipExceptDownloads(GZipMiddleware):
+    """GZip for API responses, but not for the streamed downloads at `skip_paths`.
+    Those would be compressed chunk by chunk on the event loop, and Parquet
+    is compressed already."""
+
+    def __init__(self, app, skip_paths=(), **kwargs):
+        super().__init__(app, **kwargs)
+        self.skip_paths = set(skip_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"] in self.skip_paths:
+            await self.app(scope, receive, send)
+        else:
+            await super().__call__(scope, receive, send)
+
+
 app = FastAPI()
 app.add_middleware(
     CORSMiddleware,
@@ -41,210 +87,195 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(GZipExceptDownloads, skip_paths=("/export",), minimum_size=GZIP_MINIMUM_SIZE)
 
-# ========================================
-# WEBSOCKET MANAGER
-# ========================================
-class ConnectionManager:
-    def __init__(self):
-        self.active_connections: List[WebSocket] = []
-
-    async def connect(self, websocket: WebSocket):
-        await websocket.accept()
-        self.active_connections.append(websocket)
-        logger.info(f"✅ WebSocket connected. Total: {len(self.active_connections)}")
-
-    def disconnect(self, websocket: WebSocket):
-        if websocket in self.active_connections:
-            self.active_connections.remove(websocket)
-        logger.info(f"❌ WebSocket disconnected. Total: {len(self.active_connections)}")
-
-    async def broadcast(self, message: dict):
-        logger.info(f"📡 Broadcasting ({message.get('type')}) to {len(self.active_connections)} clients")
-        disconnected = []
-        for connection in self.active_connections:
-            try:
-                await connection.send_json(message)
-            except Exception as e:
-                logger.error(f"Broadcast error: {e}")
-                disconnected.append(connection)
-        for dc in disconnected:
-            self.disconnect(dc)
-
-manager = ConnectionManager()
-
-# ========================================
-# JSON PARSER
-# ========================================
-def parse_surgery_json(data: List[Dict[str, Any]]) -> Dict[str, Any]:
-    """Parse surgery events and detect end status"""
-    surgery = {
-        "procedure_name": "",
-        "date": "",
-        "time": "",
-        "duration": 0,
-        "surgeon_name": "",
-        "patient_info": "",
-        "instruments": {},
-        "clutch_count": 0,
-        "is_ended": False,
-        "end_timestamp": None,
-    }
-
-    start_time = None
-    current_instrument = None
+tracer = Tracer(enabled=TRACING_ENABLED, keep=SLOW_OPS_PER_STAGE)
+loop_lag = LoopLagMonitor()
 
-    for event in data:
-        if not isinstance(event, dict):
-            continue
-
-        event_type = event.get("event", "")
-        value = event.get("value", "")
-        event_time_str = event.get("time")
-
-        # ─── Detect final log marker ───
-        if event_type == "Log file ended" and value == "Now":
-            surgery["is_ended"] = True
-            try:
-                surgery["end_timestamp"] = datetime.fromisoformat(event_time_str)
-            except:
-                surgery["end_timestamp"] = datetime.now()
-            continue
 
-        if event_type == "Surgery type selected":
-            surgery["procedure_name"] = str(value)
-
-        elif event_type == "Surgeon Name":
-            surgery["surgeon_name"] = str(value)
-
-        elif event_type == "Patient Info":
-            surgery["patient_info"] = str(value)
-
-        elif event_type == "Surgery started":
-            try:
-                dt = datetime.strptime(value, "%Y-%m-%d %H:%M:%S")
-                surgery["date"] = dt.strftime("%Y-%m-%d")
-                surgery["time"] = dt.strftime("%H:%M")
-                start_time = dt
-            except Exception as e:
-                logger.error(f"Start time parse error: {e}")
-
-        elif event_type == "Surgery stopped":
-            try:
-                stop_time = datetime.strptime(value, "%Y-%m-%d %H:%M:%S")
-                if start_time:
-                    surgery["duration"] = int((stop_time - start_time).total_seconds() / 60)
-                    surgery["is_ended"] = True
-                    surgery["end_timestamp"] = stop_time
-            except Exception as e:
-                logger.error(f"Stop time parse error: {e}")
-
-        elif event_type == "Surgery duration" and surgery["duration"] == 0:
-            try:
-                h, m, _ = map(int, value.split(":"))
-                surgery["duration"] = h * 60 + m
-            except:
-                pass
-
-        elif event_type == "Clutch Pedal Pressed":
-            surgery["clutch_count"] += 1
+async def trace_requests(request: Request, call_next):
+    started = time.perf_counter()
+    response = await call_next(request)
+    route = request.scope.get("route")
+    tracer.record(
+        f"http {request.method} {route.path if route else request.url.path}",
+        time.perf_counter() - started,
+        path=request.url.path, status=response.status_code,
+    )
+    return response
 
-        elif "Instrument Name" in event_type:
-            current_instrument = str(value)
-            if current_instrument not in surgery["instruments"]:
-                surgery["instruments"][current_instrument] = {"duration": 0, "count": 0}
 
-        elif "Instrument Connected duration is" in event_type and current_instrument:
-            try:
-                sec = float(value)
-                surgery["instruments"][current_instrument]["duration"] = round(sec / 60, 2)
-            except:
-                pass
+# Registered only when tracing is on – the middleware wraps every request,
+# streamed /export responses included, so leaving it out costs nothing
+if TRACING_ENABLED:
+    app.middleware("http")(trace_requests)
 
-        elif "Instrument Count is" in event_type and current_instrument:
-            try:
-                surgery["instruments"][current_instrument]["count"] = int(value)
-            except:
-                pass
+# ========================================
+# WEBSOCKET MANAGER
+# ========================================
+manager = ConnectionManager(WS_MAX_PENDING)
+cluster = ClusterNode(LEADER_LOCK_PATH, PUBSUB_SOCKET_PATH, LEADER_RETRY_INTERVAL)
+live_clock = LiveClock()
 
-    # Final duration calculation
-    if surgery["is_ended"] and start_time and surgery["end_timestamp"]:
-        surgery["duration"] = max(0, int((surgery["end_timestamp"] - start_time).total_seconds() / 60))
-    elif start_time and not surgery["is_ended"]:
-        surgery["duration"] = max(0, int((datetime.now() - start_time).total_seconds() / 60))
 
-    return surgery
+async def publish(message: dict):
+    """Send to this worker's clients and relay to every follower worker"""
+    await manager.broadcast(message)
+    await cluster.publish(message)
 
 # ========================================
 # DATABASE & ARCHIVE HELPERS
 # ========================================
-async def save_surgery(surgery: dict, is_live: bool = False) -> int | None:
-    db = await get_db()
-
+# Ingest writes go through one serialised connection; API reads never wait on it
+writer = DatabaseWriter(DB_PATH)
+readers = ReaderPool(DB_PATH, READER_POOL_SIZE)
+# With MISSO_SHARDING=1 each theater's surgeries get their own file and writer;
+# `writer`/`readers` stay the main database (catalog, checkpoints, sketches)
+shards = ShardRouter(writer, readers, SHARD_FOLDER if SHARDING else None, READER_POOL_SIZE)
+catalog = Catalog(PUBLIC_FOLDER)
+sketch_store = SketchStore()  # leader only: history percentiles for live updates
+detector = AnomalyDetector(merge_rules(ALERT_RULES, ALERT_RULES_JSON))  # leader only: live alerts
+
+
+async def apply_catalog(surgery: dict):
+    """Replace surgeon, procedure and instrument names with their canonical
+    catalog spelling and attach the ids, in place"""
+    surgeon = await catalog.intern(writer, "surgeon", surgery["surgeon_name"])
+    procedure = await catalog.intern(writer, "procedure", surgery["procedure_name"])
+    surgery["surgeon_name"], surgery["surgeon_id"] = surgeon["name"], surgeon["id"]
+    surgery["procedure_name"], surgery["procedure_id"] = procedure["name"], procedure["id"]
+
+    instruments = {}
+    for name, inst in surgery["instruments"].items():
+        entry = await catalog.intern(writer, "instrument", name)
+        if entry is None:
+            instruments[name] = inst
+            continue
+        previous = instruments.get(entry["name"])
+        if previous:  # two spellings of one instrument in the same log
+            inst = {**inst, "duration": previous["duration"] + inst["duration"],
+                    "count": previous["count"] + inst["count"]}
+        instruments[entry["name"]] = {**inst, "id": entry["id"]}
+    surgery["instruments"] = instruments
+
+
+async def save_surgery(surgery: dict, theater: str, is_live: bool = False,
+                       clutch_offsets: bytes | None = None, live_id: int | None = None) -> int | None:
+    """Insert or update a surgery row. A completed surgery with `live_id`
+    finalises that live row in place, so no truncated copy is left behind."""
     instruments_names = ",".join(surgery["instruments"].keys())
     instruments_durations = ",".join(
         str(round(v["duration"], 2)) for v in surgery["instruments"].values()
     )
+    instrument_ids = ",".join(str(v.get("id", "")) for v in surgery["instruments"].values())
 
     try:
-        # Check for existing live surgery by surgeon
-        cursor = await db.execute(
-            "SELECT id FROM surgeries WHERE is_live = 1 AND surgeon_name = ?",
-            (surgery["surgeon_name"],)
-        )
-        existing = await cursor.fetchone()
+        shard_writer = shards.writer_for_id(live_id) if live_id else await shards.writer_for(theater)
+        async with shard_writer.transaction() as db:
+            if is_live:
+                # Check for existing live surgery by surgeon
+                cursor = await db.execute(
+                    "SELECT id FROM surgeries WHERE is_live = 1 AND surgeon_id = ?",
+                    (surgery["surgeon_id"],)
+                )
+                existing = await cursor.fetchone()
+            else:
+                cursor = await db.execute("SELECT id FROM surgeries WHERE is_live = 1 AND id = ?", (live_id,))
+                existing = await cursor.fetchone() if live_id else None
+
+            if existing:
+                # Update the live record – still live, or now complete
+                await db.execute("""
+                    UPDATE surgeries SET
+                        procedure_name = ?, date = ?, time = ?, duration = ?,
+                        patient_info = ?, instruments_names = ?, instruments_durations = ?,
+                        clutch_count = ?, is_live = ?, procedure_id = ?, instrument_ids = ?,
+                        clutch_offsets = ?
+                    WHERE id = ?
+                """, (
+                    surgery["procedure_name"], surgery["date"], surgery["time"], surgery["duration"],
+                    surgery["patient_info"], instruments_names, instruments_durations,
+                    surgery["clutch_count"], 1 if is_live else 0, surgery["procedure_id"], instrument_ids,
+                    clutch_offsets, existing[0]
+                ))
+                surgery_id = existing[0]
+                logger.info("Updated %s surgery %s – %s min", "live" if is_live else "completed",
+                            surgery_id, surgery["duration"])
+            else:
+                # Insert new record
+                cursor = await db.execute("""
+                    INSERT INTO surgeries (
+                        procedure_name, date, time, duration, surgeon_name,
+                        patient_info, instruments_names, instruments_durations,
+                        clutch_count, is_live, surgeon_id, procedure_id, instrument_ids,
+                        clutch_offsets
+                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """, (
+                    surgery["procedure_name"], surgery["date"], surgery["time"], surgery["duration"],
+                    surgery["surgeon_name"], surgery["patient_info"], instruments_names,
+                    instruments_durations, surgery["clutch_count"], 1 if is_live else 0,
+                    surgery["surgeon_id"], surgery["procedure_id"], instrument_ids, clutch_offsets
+                ))
+                surgery_id = cursor.lastrowid
+                logger.info("Inserted %s surgery %s", "live" if is_live else "completed", surgery_id)
 
-        if existing and is_live:
-            # Update existing live record
-            await db.execute("""
-                UPDATE surgeries SET
-                    procedure_name = ?, date = ?, time = ?, duration = ?,
-                    patient_info = ?, instruments_names = ?, instruments_durations = ?,
-                    clutch_count = ?, is_live = 1
-                WHERE id = ?
-            """, (
-                surgery["procedure_name"], surgery["date"], surgery["time"], surgery["duration"],
-                surgery["patient_info"], instruments_names, instruments_durations,
-                surgery["clutch_count"], existing[0]
-            ))
-            surgery_id = existing[0]
-            logger.info(f"Updated live surgery {surgery_id} – {surgery['duration']} min")
-        else:
-            # Insert new record
-            cursor = await db.execute("""
-                INSERT INTO surgeries (
-                    procedure_name, date, time, duration, surgeon_name,
-                    patient_info, instruments_names, instruments_durations,
-                    clutch_count, is_live
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                surgery["procedure_name"], surgery["date"], surgery["time"], surgery["duration"],
-                surgery["surgeon_name"], surgery["patient_info"], instruments_names,
-                instruments_durations, surgery["clutch_count"], 1 if is_live else 0
-            ))
-            surgery_id = cursor.lastrowid
-            logger.info(f"Inserted {'live' if is_live else 'completed'} surgery {surgery_id}")
-
-        await db.commit()
         return surgery_id
 
     except Exception as e:
         logger.error(f"DB error: {e}", exc_info=True)
         return None
-    finally:
-        await db.close()
 
 
 async def mark_surgery_complete(surgery_id: int):
-    db = await get_db()
     try:
-        await db.execute("UPDATE surgeries SET is_live = 0 WHERE id = ?", (surgery_id,))
-        await db.commit()
-        logger.info(f"Marked surgery {surgery_id} as completed")
+        async with shards.writer_for_id(surgery_id).transaction() as db:
+            await db.execute("UPDATE surgeries SET is_live = 0 WHERE id = ?", (surgery_id,))
+        logger.info("Marked surgery %s as completed", surgery_id)
     except Exception as e:
         logger.error(f"Error marking complete: {e}")
-    finally:
-        await db.close()
+
+
+async def get_live_surgery_ids() -> Set[int]:
+    async def live_ids(db):
+        cursor = await db.execute("SELECT id FROM surgeries WHERE is_live = 1")
+        return {row[0] for row in await cursor.fetchall()}
+    return set().union(*await shards.fan_out(live_ids))
+
+
+async def load_checkpoints() -> Dict[str, tuple]:
+    """log path → (live surgery id, surgeon, parser state)"""
+    async with readers.acquire() as db:
+        cursor = await db.execute(
+            "SELECT path, surgery_id, surgeon_name, parser_state FROM ingest_checkpoints"
+        )
+        return {row[0]: (row[1], row[2], json.loads(row[3])) for row in await cursor.fetchall()}
+
+
+async def save_checkpoint(path: str, surgery_id: int, surgeon_name: str, state: dict):
+    try:
+        async with writer.transaction() as db:
+            await db.execute("""
+                INSERT INTO ingest_checkpoints (path, surgery_id, surgeon_name, parser_state, updated_at)
+                VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+                ON CONFLICT(path) DO UPDATE SET
+                    surgery_id = excluded.surgery_id, surgeon_name = excluded.surgeon_name,
+                    parser_state = excluded.parser_state, updated_at = excluded.updated_at
+            """, (path, surgery_id, surgeon_name, json.dumps(state)))
+    except Exception as e:
+        logger.error(f"Checkpoint error: {e}")
+
+
+async def delete_checkpoint(path: str):
+    async with writer.transaction() as db:
+        await db.execute("DELETE FROM ingest_checkpoints WHERE path = ?", (path,))
+
+
+def write_atomic(path: Path, text: str):
+    """Replace a file's contents so readers see the old or the new file, never half of one"""
+    tmp = path.with_name(f".{path.name}.tmp")
+    with open(tmp, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(tmp, path)
 
 
 def archive_and_clear_json(filepath: Path, surgeon_name: str, procedure_name: str):
@@ -253,16 +284,15 @@ def archive_and_clear_json(filepath: Path, surgeon_name: str, procedure_name: st
         safe_surgeon = surgeon_name.replace(" ", "_").replace(".", "")
         safe_proc = procedure_name.replace(" ", "_").replace("/", "-")
 
-        archive_name = f"{safe_surgeon}_{safe_proc}_{timestamp}.json"
+        archive_name = f"{safe_surgeon}_{safe_proc}_{timestamp}{filepath.suffix}"
         archive_path = ARCHIVE_FOLDER / archive_name
 
         shutil.copy2(filepath, archive_path)
-        logger.info(f"Archived → {archive_path}")
+        logger.info("Archived → %s", archive_path)
 
         # Clear current file → ready for next surgery
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump([], f, indent=2)
-        logger.info(f"Cleared current_surgery.json")
+        write_atomic(filepath, "" if filepath.suffix == ".ndjson" else json.dumps([], indent=2))
+        logger.info("Cleared %s", filepath.name)
 
     except Exception as e:
         logger.error(f"Archive/clear error: {e}")
@@ -273,92 +303,311 @@ def archive_and_clear_json(filepath: Path, surgeon_name: str, procedure_name: st
 class SurgeryFileHandler(FileSystemEventHandler):
     def __init__(self, loop: asyncio.AbstractEventLoop):
         self.loop = loop
-        self.last_modified = {}
+        # Debounce marks, per-log activity and per-surgeon content digests, all
+        # bounded: a log idle past the TTL (or pushed out by newer ones) has its
+        # parser dropped too and is simply reparsed if it changes again
+        self.state = StateStore(WATCH_STATE_MAX_ENTRIES, WATCH_STATE_TTL, on_evict=self._evicted)
+        self.swept_at = time.monotonic()
         self.surgeon_surgery_map: Dict[str, int] = {}  # surgeon → live surgery id
+        self.parsers: Dict[str, SurgeryParser] = {}  # log path → incremental parser
+        self.offsets: Dict[str, int] = {}  # NDJSON log path → bytes consumed
+        self.cursors: Dict[str, ArrayCursor] = {}  # JSON log path → end of the array last decoded
+        self.locks: Dict[str, asyncio.Lock] = {}  # one ingest at a time per log, while it runs
+        self.rerun: Set[str] = set()  # logs that changed again while being ingested
+        # Large logs parse in worker processes; huge ones may never hold every worker
+        self.pool: ProcessPoolExecutor | None = None
+        self.pool_slots = asyncio.Semaphore(PARSE_POOL_WORKERS)
+        self.huge_slots = asyncio.Semaphore(max(1, PARSE_POOL_WORKERS - 1))
+
+    def _parser_for(self, path: str, data: List[Any]) -> SurgeryParser:
+        """Continue the log's parser from where it stopped, or start over if the log was replaced"""
+        parser = self.parsers.get(path)
+        if parser is None or not parser.resumes(data):
+            parser = SurgeryParser()
+        parser.feed(data[parser.events_seen:])
+        self.parsers[path] = parser
+        return parser
+
+    async def restore(self) -> Set[int]:
+        """Rebuild live state from checkpoints; returns the ids of live rows.
+        Runs before the watcher starts, so no pass can race a restored parser."""
+        live_ids = await get_live_surgery_ids()
+        for path, (surgery_id, surgeon, state) in (await load_checkpoints()).items():
+            if path in self.parsers:
+                continue  # already read since start-up – newer than its checkpoint
+            if "byte_offset" in state:
+                self.offsets[path] = state.pop("byte_offset")
+            self.parsers[path] = SurgeryParser.from_state(state)
+            self.state.set(("log", path), True)
+            if surgery_id in live_ids:
+                self.surgeon_surgery_map[surgeon] = surgery_id
+        logger.info("Restored %d checkpoints, %d live surgeries",
+                    len(self.parsers), len(self.surgeon_surgery_map))
+        return live_ids
+
+    async def catch_up(self, live_ids: Set[int]):
+        """Pick up logs written while down and close live rows no log accounts for"""
+        for path in list(self.parsers):
+            if not Path(path).exists():
+                del self.parsers[path]
+                self.offsets.pop(path, None)
+                self.state.pop(("log", path))
+                await delete_checkpoint(path)
+        for path in sorted(p for p in WATCH_FOLDER.iterdir() if p.suffix in LOG_SUFFIXES):
+            await self.process_file(str(path))
+
+        # Live rows no log accounts for were left behind by a crash mid-surgery
+        for orphan_id in live_ids - set(self.surgeon_surgery_map.values()):
+            logger.warning(f"Closing orphaned live surgery {orphan_id}")
+            live_clock.forget_surgery(orphan_id)
+            await mark_surgery_complete(orphan_id)
 
     def on_modified(self, event):
-        if event.is_directory or not event.src_path.endswith('.json'):
-            return
+        if not event.is_directory:
+            self._changed(event.src_path)
 
-        now = datetime.now().timestamp()
-        path = event.src_path
-        if path in self.last_modified and now - self.last_modified[path] < 1.5:
-            return
-        self.last_modified[path] = now
+    def on_created(self, event):
+        if not event.is_directory:
+            self._changed(event.src_path)
+
+    def on_moved(self, event):
+        # Producers that rewrite the whole log do it atomically: temp file + rename
+        if not event.is_directory:
+            self._changed(event.dest_path)
 
-        logger.info(f"File changed: {path}")
-        asyncio.run_coroutine_threadsafe(self.process_file(path), self.loop)
+    def _changed(self, path: str):
+        # Watchdog thread: hand over to the loop, which owns all the state
+        if Path(path).suffix in LOG_SUFFIXES:
+            self.loop.call_soon_threadsafe(self._debounce, path)
+
+    def _debounce(self, path: str):
+        if ("changed", path) in self.state:
+            return
+        self.state.set(("changed", path), True, ttl=LOG_DEBOUNCE_SECONDS)
+        if time.monotonic() - self.swept_at > 60:
+            self.state.sweep()
+            self.swept_at = time.monotonic()
+
+        logger.info("File changed: %s", path)
+        self.loop.create_task(self.process_file(path))
+
+    def _evicted(self, key: tuple, value):
+        kind, name = key
+        if kind == "log" and name not in self.locks:  # never under a running ingest
+            parser = self.parsers.pop(name, None)
+            if parser is not None:
+                live_clock.forget(parser.surgery["surgeon_name"])
+            self.offsets.pop(name, None)
+            self.cursors.pop(name, None)
+            detector.forget(name)
+
+    async def _tail_ndjson(self, path: str) -> SurgeryParser | None:
+        """Feed only the lines appended to an NDJSON log since the last pass"""
+        parser = self.parsers.get(path)
+        read = await asyncio.to_thread(read_ndjson, path, self.offsets.get(path, 0) if parser else 0)
+        if parser and (read.start == 0 or not parser.starts_with(read.first_event)):
+            parser = None  # truncated or replaced by a new surgery
+            if read.start:
+                read = await asyncio.to_thread(read_ndjson, path, 0)
+        for error in read.malformed:
+            logger.warning(f"Skipping malformed line in {Path(path).name}: {error}")
+
+        parser = (parser or SurgeryParser()).feed(read.events)
+        self.parsers[path] = parser
+        self.offsets[path] = read.consumed
+        self.state.set(("stat", path), read.stat)
+        return parser if parser.events_seen else None
+
+    async def _read_json(self, path: str) -> ArrayRead:
+        """The whole array on first sight, then only the events appended since the
+        last pass; a full re-read of a large log is left to the process pool"""
+        cursor = self.cursors.get(path) if path in self.parsers else None
+        return await asyncio.to_thread(read_json_array, path, cursor, PARSE_INLINE_MAX_BYTES)
+
+    async def _parse_offloaded(self, path: str, size: int) -> SurgeryParser | None:
+        """Parse a large log in the process pool and adopt the state it returns"""
+        if self.pool is None:
+            self.pool = ProcessPoolExecutor(
+                max_workers=PARSE_POOL_WORKERS, mp_context=multiprocessing.get_context("spawn")
+            )
+        previous = self.parsers.get(path)
+        huge = size >= PARSE_HUGE_BYTES
+        if huge:
+            await self.huge_slots.acquire()
+        try:
+            async with self.pool_slots:
+                read, state = await self.loop.run_in_executor(
+                    self.pool, parse_json_log, path, previous.to_state() if previous else None
+                )
+        except BrokenProcessPool:
+            logger.error("Parse pool died – parsing this log in a thread and restarting the pool")
+            self.pool = None
+            read, state = await asyncio.to_thread(parse_json_log, path, previous.to_state() if previous else None)
+        finally:
+            if huge:
+                self.huge_slots.release()
+        if state is None:
+            return None
+        self.parsers[path] = SurgeryParser.from_state(state)
+        self.cursors[path] = read.cursor
+        self.state.set(("stat", path), read.stat)
+        return self.parsers[path]
+
+    async def _detect(self, path: str, parser: SurgeryParser, surgery: dict, surgery_id: int, theater: str):
+        try:
+            history = sketch_store.sketches.get((surgery["surgeon_id"], surgery["procedure_id"], "duration"))
+            alerts = detector.observe(path, parser, surgery, history)
+        except Exception as e:
+            logger.error(f"Anomaly detection error: {e}", exc_info=True)
+            return
+        for alert in alerts:
+            logger.warning("Alert for %s in %s: %s", surgery["surgeon_name"], theater, alert["message"])
+            await publish({**alert, "surgeon_name": surgery["surgeon_name"],
+                           "surgery_id": surgery_id, "theater": theater})
 
     async def process_file(self, filepath_str: str):
+        lock = self.locks.setdefault(filepath_str, asyncio.Lock())
+        if lock.locked():
+            # Collapse a burst of changes into one more pass after the current one
+            self.rerun.add(filepath_str)
+            return
+        self.state.set(("log", filepath_str), True)
+        async with lock:
+            while True:
+                self.rerun.discard(filepath_str)
+                with tracer.span("ingest.total", file=Path(filepath_str).name):
+                    await self._process_file(filepath_str)
+                if filepath_str not in self.rerun:
+                    break
+        del self.locks[filepath_str]
+
+    async def _process_file(self, filepath_str: str):
         filepath = Path(filepath_str)
+        # Size, mtime and inode tell a real change from a repeated or stale
+        # event (our own clear after completion included) before any reading
+        stat = await asyncio.to_thread(stat_log, filepath_str)
+        if stat is None or stat == self.state.get(("stat", filepath_str)):
+            return
         max_retries = 4
         for attempt in range(max_retries):
             try:
                 await asyncio.sleep(0.15)
 
-                with open(filepath, 'r', encoding='utf-8') as f:
-                    content = f.read().strip()
-
-                if not content or content == '[]':
-                    if attempt == max_retries - 1:
-                        logger.warning(f"File empty after retries: {filepath}")
-                    await asyncio.sleep(0.4)
-                    continue
-
-                data = json.loads(content)
-                if not isinstance(data, list) or not data:
-                    logger.warning("Invalid or empty event list")
-                    return
-
-                surgery = parse_surgery_json(data)
-                if not surgery["surgeon_name"] or not surgery["procedure_name"]:
+                if filepath.suffix == ".ndjson":
+                    with tracer.span("ingest.tail", file=filepath.name):
+                        parser = await self._tail_ndjson(filepath_str)
+                    if parser is None:
+                        return  # empty, or only a partially written line so far
+                else:
+                    with tracer.span("ingest.read", file=filepath.name):
+                        read = await self._read_json(filepath_str)
+
+                    if read.events is None and read.stat.size >= PARSE_INLINE_MAX_BYTES:
+                        with tracer.span("ingest.parse_offloaded", file=filepath.name, bytes=read.stat.size):
+                            parser = await self._parse_offloaded(filepath_str, read.stat.size)
+                        if parser is None:
+                            logger.warning("Invalid or empty event list")
+                            return
+                    elif read.appended:
+                        with tracer.span("ingest.parse", file=filepath.name, events=len(read.events)):
+                            parser = self.parsers[filepath_str].feed(read.events)
+                    elif not read.events:
+                        if attempt == max_retries - 1:
+                            logger.warning(f"File empty after retries: {filepath}")
+                        await asyncio.sleep(0.4)
+                        continue
+                    elif not isinstance(read.events, list):
+                        logger.warning("Invalid or empty event list")
+                        return
+                    else:
+                        with tracer.span("ingest.parse", file=filepath.name, events=len(read.events)):
+                            parser = self._parser_for(filepath_str, read.events)
+                    if read.cursor is not None:
+                        self.cursors[filepath_str] = read.cursor
+                    self.state.set(("stat", filepath_str), read.stat)
+                surgery = parser.snapshot()
+                if not catalog_key(surgery["surgeon_name"]) or not catalog_key(surgery["procedure_name"]):
                     logger.warning("Missing surgeon or procedure – skipping")
                     return
+                await apply_catalog(surgery)
 
                 surgeon = surgery["surgeon_name"]
                 is_complete = surgery["is_ended"] and surgery["duration"] > 0
 
-                logger.info(f"→ {surgeon} | {surgery['procedure_name']} | "
-                            f"{'COMPLETE' if is_complete else 'LIVE'} | "
-                            f"{surgery['duration']} min")
+                logger.info("→ %s | %s | %s | %s min", surgeon, surgery["procedure_name"],
+                            "COMPLETE" if is_complete else "LIVE", surgery["duration"])
 
                 if is_complete:
                     # Complete surgery logic
-                    if surgeon in self.surgeon_surgery_map:
-                        old_id = self.surgeon_surgery_map[surgeon]
-                        await mark_surgery_complete(old_id)
-                        del self.surgeon_surgery_map[surgeon]
-
-                    surgery_id = await save_surgery(surgery, is_live=False)
+                    with tracer.span("ingest.db", file=filepath.name, status="completed"):
+                        live_id = self.surgeon_surgery_map.pop(surgeon, None)
+                        live_clock.forget(surgeon)
+                        detector.forget(filepath_str)
+
+                        surgery_id = await save_surgery(
+                            surgery, filepath.stem, is_live=False, clutch_offsets=pack_offsets(parser.clutch_offsets),
+                            live_id=live_id,
+                        )
                     if surgery_id:
-                        logger.info(f"Completed surgery saved → ID {surgery_id}")
+                        logger.info("Completed surgery saved → ID %s", surgery_id)
+                        async with writer.transaction() as db:
+                            await sketch_store.record(db, surgery)
 
                         # Archive & clear file
                         archive_and_clear_json(filepath, surgeon, surgery["procedure_name"])
+                        self.parsers.pop(filepath_str, None)
+                        self.offsets.pop(filepath_str, None)
+                        self.cursors.pop(filepath_str, None)
+                        self.state.set(("stat", filepath_str), await asyncio.to_thread(stat_log, filepath_str))
+                        self.state.pop(("digest", surgeon))
+                        await delete_checkpoint(filepath_str)
 
                         # Broadcast completion – frontend should KEEP showing this
-                        await manager.broadcast({
-                            "type": "surgery_complete",
-                            "surgery": surgery,
-                            "surgeon_name": surgeon,
-                            "surgery_id": surgery_id,
-                            "status": "completed"
-                        })
+                        with tracer.span("ingest.broadcast", file=filepath.name):
+                            await publish({
+                                "type": "surgery_complete",
+                                "surgery": surgery,
+                                "surgeon_name": surgeon,
+                                "surgery_id": surgery_id,
+                                "theater": filepath.stem,
+                                "status": "completed"
+                            })
 
                 else:
-                    # Live update
-                    surgery_id = await save_surgery(surgery, is_live=True)
+                    # Live update – nothing to write or send if only the file's mtime moved
+                    fingerprint = update_digest(surgery)
+                    if self.state.get(("digest", surgeon)) == fingerprint:
+                        logger.debug("No changes for %s", surgeon)
+                        break
+                    with tracer.span("ingest.db", file=filepath.name, status="live"):
+                        surgery_id = await save_surgery(
+                            surgery, filepath.stem, is_live=True, clutch_offsets=pack_offsets(parser.clutch_offsets)
+                        )
+                        if surgery_id:
+                            state = parser.to_state()
+                            if filepath_str in self.offsets:
+                                state["byte_offset"] = self.offsets[filepath_str]
+                            await save_checkpoint(filepath_str, surgery_id, surgeon, state)
                     if surgery_id:
+                        self.state.set(("digest", surgeon), fingerprint)
                         self.surgeon_surgery_map[surgeon] = surgery_id
-                        logger.info(f"Live update → ID {surgery_id}")
-
-                        await manager.broadcast({
-                            "type": "surgery_update",
-                            "surgery": surgery,
-                            "surgeon_name": surgeon,
-                            "surgery_id": surgery_id,
-                            "status": "live"
-                        })
+                        live_clock.track(surgery_id, surgery, filepath.stem)
+                        logger.info("Live update → ID %s", surgery_id)
+
+                        with tracer.span("ingest.broadcast", file=filepath.name):
+                            await publish({
+                                "type": "surgery_update",
+                                "surgery": surgery,
+                                "surgeon_name": surgeon,
+                                "surgery_id": surgery_id,
+                                "theater": filepath.stem,
+                                "percentiles": sketch_store.percentiles(surgery),
+                                "status": "live"
+                            })
+
+                        # After the update has gone out, so alerts never delay it
+                        with tracer.span("ingest.detect", file=filepath.name):
+                            await self._detect(filepath_str, parser, surgery, surgery_id, filepath.stem)
 
                 break  # success
 
@@ -374,44 +623,373 @@ class SurgeryFileHandler(FileSystemEventHandler):
 # FILE WATCHER SETUP
 # ========================================
 observer: Observer | None = None
+file_handler: SurgeryFileHandler | None = None
+background_tasks: List[asyncio.Task] = []
 
-def start_file_watcher(loop: asyncio.AbstractEventLoop):
+def start_file_watcher(handler: SurgeryFileHandler):
     global observer
-    handler = SurgeryFileHandler(loop)
     observer = Observer()
     observer.schedule(handler, str(WATCH_FOLDER), recursive=False)
     observer.start()
-    logger.info(f"Started watching: {WATCH_FOLDER}")
+    logger.info("Started watching: %s", WATCH_FOLDER)
 
 # ========================================
 # API ROUTES
 # ========================================
+def _row_to_dict(r) -> dict:
+    return {
+        "id": r[0], "procedure_name": r[1], "date": r[2], "time": r[3],
+        "duration": r[4], "surgeon_name": r[5], "patient_info": r[6],
+        "instruments_names": r[7], "instruments_durations": r[8],
+        "clutch_count": r[9], "created_at": r[10], "is_live": bool(r[11])
+    }
+
+
+# History can also be sent pre-parsed: "parsed" rows carry an instruments
+# array and a start timestamp, "columnar" sends one array per field with
+# instrument names dictionary-encoded – far smaller for long histories
+HISTORY_FORMATS = ("rows", "parsed", "columnar")
+HISTORY_COLUMNS = [
+    "id", "procedure_name", "date", "time", "duration", "surgeon_name", "patient_info",
+    "clutch_count", "created_at", "is_live", "started_at",
+]
+
+
+def _instrument_pairs(r) -> List[tuple]:
+    """(canonical name, minutes) for each instrument on a surgeries row"""
+    names = r["instruments_names"].split(",") if r["instruments_names"] else []
+    durations = r["instruments_durations"].split(",") if r["instruments_durations"] else []
+    pairs = []
+    for index, name in enumerate(names):
+        name = name.strip()
+        entry = catalog.lookup("instrument", name)
+        minutes = durations[index] if index < len(durations) else ""
+        pairs.append((entry["name"] if entry else name, float(minutes) if minutes else 0.0))
+    return pairs
+
+
+def _started_at(r) -> int | None:
+    """Surgery start as epoch milliseconds, so clients need not parse dates"""
+    try:
+        return int(datetime.fromisoformat(f"{r['date']}T{r['time']}").timestamp() * 1000)
+    except (TypeError, ValueError):
+        return None
+
+
+def _instrument_image(name: str) -> str | None:
+    entry = catalog.lookup("instrument", name)
+    return entry["image"] if entry else None
+
+
+def _row_to_parsed(r) -> dict:
+    row = {c: r[c] for c in HISTORY_COLUMNS[:-1]}
+    row["is_live"] = bool(r["is_live"])
+    row["started_at"] = _started_at(r)
+    row["instruments"] = [
+        {"name": name, "duration": minutes, "image": _instrument_image(name)}
+        for name, minutes in _instrument_pairs(r)
+    ]
+    return row
+
+
+def _rows_to_columnar(rows) -> dict:
+    """{"count", "columns": {field: [...]}, "instrument_names", "instrument_images"};
+    columns["instruments"][i] is a list of [name index, minutes] pairs"""
+    columns: Dict[str, list] = {c: [] for c in HISTORY_COLUMNS + ["instruments"]}
+    names: Dict[str, int] = {}
+    for r in rows:
+        for c in HISTORY_COLUMNS[:-2]:
+            columns[c].append(r[c])
+        columns["is_live"].append(bool(r["is_live"]))
+        columns["started_at"].append(_started_at(r))
+        columns["instruments"].append([
+            [names.setdefault(name, len(names)), minutes] for name, minutes in _instrument_pairs(r)
+        ])
+    return {
+        "count": len(rows),
+        "columns": columns,
+        "instrument_names": list(names),
+        "instrument_images": [_instrument_image(name) for name in names],
+    }
+
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return "*" in candidates or etag in candidates
+
+
 @app.get("/surgeries/{surgeon_name}")
-async def get_surgeries_by_surgeon(surgeon_name: str):
-    db = await get_db()
+async def get_surgeries_by_surgeon(surgeon_name: str, request: Request, include_archive: bool = False,
+                                   format: str = "rows"):
+    if format not in HISTORY_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(HISTORY_FORMATS)}")
     try:
+        return await _surgeon_history(surgeon_name, request, include_archive, format)
+    except Exception as e:
+        logger.error(f"Query error: {e}")
+        return []
+
+
+async def _surgeon_history(surgeon_name: str, request: Request, include_archive: bool, format: str):
+    # Any spelling of the surgeon resolves to the one catalog entry
+    async with readers.acquire() as db:
+        surgeon = await catalog.resolve(db, "surgeon", surgeon_name)
+    if surgeon is None:
+        return JSONResponse(_rows_to_columnar([]) if format == "columnar" else [])
+    surgeon_name = surgeon["name"]
+    versions = await shards.fan_out(lambda db: get_surgeon_version(db, surgeon["id"]))
+    etag_key = f"surgeon {surgeon['id']}:{','.join(map(str, versions))}:{include_archive}:{format}"
+    etag = '"' + hashlib.sha1(etag_key.encode()).hexdigest()[:20] + '"'
+    cache_headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if _etag_matches(request, etag):
+        return Response(status_code=304, headers=cache_headers)
+
+    async def latest(db):
         cursor = await db.execute("""
-            SELECT * FROM surgeries 
-            WHERE surgeon_name = ?
+            SELECT * FROM surgeries
+            WHERE surgeon_id = ?
             ORDER BY created_at DESC
             LIMIT 50
-        """, (surgeon_name,))
-        rows = await cursor.fetchall()
+        """, (surgeon["id"],))
+        return await cursor.fetchall()
+
+    # Each shard returns its newest 50; the newest 50 overall are among them
+    rows = [r for shard_rows in await shards.fan_out(latest) for r in shard_rows]
+    rows = sorted(rows, key=lambda r: r["created_at"], reverse=True)[:50]
+
+    # Older cases live in monthly archive files, attached only when asked for.
+    # Rows archived before the catalog have no surgeon id, so the name matches
+    # too; archives last written back then lack the column and match by name only.
+    if include_archive and len(rows) < 50:
+        async with readers.acquire() as db:
+            rows += await fetch_from_archives(db, ARCHIVE_DB_FOLDER, """
+                SELECT * FROM archive.surgeries
+                WHERE surgeon_id = ? OR surgeon_name = ?
+                ORDER BY created_at DESC
+                LIMIT ?
+            """, (surgeon["id"], surgeon_name), 50 - len(rows), legacy=("""
+                SELECT * FROM archive.surgeries
+                WHERE surgeon_name = ?
+                ORDER BY created_at DESC
+                LIMIT ?
+            """, (surgeon_name,)))
+
+    if format == "columnar":
+        return JSONResponse(_rows_to_columnar(rows), headers=cache_headers)
+    to_dict = _row_to_parsed if format == "parsed" else _row_to_dict
+    return JSONResponse([to_dict(r) for r in rows], headers=cache_headers)
+
+
+def _fts_query(text: str) -> str:
+    """Free text → FTS5 query: every word must match, as a prefix, in any column"""
+    return " ".join(f'"{word}"*' for word in re.findall(r"\w+", text))
+
+
+@app.get("/search")
+async def search_surgeries(
+    q: str | None = None,
+    date_from: date | None = None,
+    date_to: date | None = None,
+    min_duration: int | None = None,
+    max_duration: int | None = None,
+    is_live: bool | None = None,
+    limit: int = Query(50, ge=1, le=500),
+    offset: int = Query(0, ge=0),
+):
+    """Full-text search over procedure, surgeon and patient info with indexed filters"""
+    match = _fts_query(q) if q else ""
+    if q and not match:
+        return {"results": [], "limit": limit, "offset": offset, "has_more": False}
+
+    if match:
+        sql = """
+            SELECT s.*, bm25(surgeries_fts) AS rank
+            FROM surgeries_fts JOIN surgeries s ON s.id = surgeries_fts.rowid
+            WHERE surgeries_fts MATCH ?
+        """
+        params: list = [match]
+    else:
+        sql = "SELECT s.*, NULL AS rank FROM surgeries s WHERE 1 = 1"
+        params = []
+
+    for clause, value in (
+        ("s.date >= ?", date_from.isoformat() if date_from else None),
+        ("s.date <= ?", date_to.isoformat() if date_to else None),
+        ("s.duration >= ?", min_duration),
+        ("s.duration <= ?", max_duration),
+        ("s.is_live = ?", None if is_live is None else int(is_live)),
+    ):
+        if value is not None:
+            sql += f" AND {clause}"
+            params.append(value)
+
+    sql += " ORDER BY rank, s.created_at DESC" if match else " ORDER BY s.created_at DESC"
+    # Every shard returns its first offset + limit + 1 rows and the merged page
+    # is cut from those; the extra row tells us whether there is a next page
+    sql += " LIMIT ?"
+    params.append(offset + limit + 1)
+
+    async def page(db):
+        cursor = await db.execute(sql, params)
+        return await cursor.fetchall()
 
-        return [
-            {
-                "id": r[0], "procedure_name": r[1], "date": r[2], "time": r[3],
-                "duration": r[4], "surgeon_name": r[5], "patient_info": r[6],
-                "instruments_names": r[7], "instruments_durations": r[8],
-                "clutch_count": r[9], "created_at": r[10], "is_live": bool(r[11])
-            }
-            for r in rows
-        ]
+    try:
+        rows = [r for shard_rows in await shards.fan_out(page) for r in shard_rows]
     except Exception as e:
-        logger.error(f"Query error: {e}")
-        return []
-    finally:
-        await db.close()
+        logger.error(f"Search error: {e}")
+        raise HTTPException(status_code=500, detail="search failed")
+    rows.sort(key=lambda r: r["created_at"], reverse=True)
+    if match:
+        rows.sort(key=lambda r: r["rank"])  # stable: ties stay newest first
+    rows = rows[offset:]
+
+    results = []
+    for r in rows[:limit]:
+        item = _row_to_dict(r)
+        if match:
+            item["rank"] = r["rank"]
+        results.append(item)
+    return {"results": results, "limit": limit, "offset": offset, "has_more": len(rows) > limit}
+
+
+@app.get("/percentiles/{surgeon_name}")
+async def get_percentiles(surgeon_name: str, procedure: str | None = None, metric: str = "duration"):
+    """A surgeon's historical distribution for one procedure, or merged over all of them"""
+    async with readers.acquire() as db:
+        surgeon = await catalog.resolve(db, "surgeon", surgeon_name)
+        proc = await catalog.resolve(db, "procedure", procedure) if procedure else None
+        if surgeon is None or (procedure and proc is None):
+            raise HTTPException(status_code=404, detail="unknown surgeon or procedure")
+        sql = "SELECT sketch FROM surgery_sketches WHERE surgeon_id = ? AND metric = ?"
+        params = [surgeon["id"], metric]
+        if proc:
+            sql += " AND procedure_id = ?"
+            params.append(proc["id"])
+        cursor = await db.execute(sql, params)
+        rows = await cursor.fetchall()
+
+    sketch = QuantileSketch()
+    for row in rows:
+        sketch.merge(QuantileSketch.from_bytes(row[0]))
+    return {
+        "surgeon_name": surgeon["name"],
+        "procedure_name": proc["name"] if proc else None,
+        "metric": metric,
+        "samples": sketch.count,
+        "quantiles": {
+            f"p{int(q * 100)}": None if not sketch.count else round(sketch.quantile(q), 2)
+            for q in (0.1, 0.25, 0.5, 0.75, 0.9)
+        },
+    }
+
+
+@app.get("/clutches/{surgery_id}")
+async def get_clutch_series(
+    surgery_id: int,
+    bin_seconds: float = Query(60, ge=1),
+    window_seconds: float = Query(60, ge=1),
+    step_seconds: float | None = Query(None, ge=1),
+):
+    """Clutch presses per time bin plus a rolling clutches-per-minute series"""
+    pool = await shards.readers_for_id(surgery_id)
+    row = None
+    if pool is not None:
+        async with pool.acquire() as db:
+            cursor = await db.execute(
+                "SELECT duration, clutch_count, clutch_offsets FROM surgeries WHERE id = ?", (surgery_id,)
+            )
+            row = await cursor.fetchone()
+    if row is None:
+        raise HTTPException(status_code=404, detail="surgery not found")
+
+    offsets = unpack_offsets(row["clutch_offsets"])
+    span = max(row["duration"] * 60, offsets[-1] if len(offsets) else 0)
+    step_seconds = step_seconds or bin_seconds
+    if span / min(bin_seconds, step_seconds) > CLUTCH_SERIES_MAX_POINTS:
+        raise HTTPException(status_code=400, detail=f"resolution too fine: over {CLUTCH_SERIES_MAX_POINTS} points")
+
+    return {
+        "surgery_id": surgery_id,
+        "clutch_count": row["clutch_count"],
+        "timed_presses": len(offsets),  # surgeries ingested before press times were kept have none
+        "span_seconds": span,
+        "histogram": {"bin_seconds": bin_seconds, "counts": histogram(offsets, bin_seconds, span)},
+        "rate": {
+            "window_seconds": window_seconds,
+            "step_seconds": step_seconds,
+            "per_minute": rolling_rate(offsets, window_seconds, step_seconds, span),
+        },
+    }
+
+
+@app.get("/export")
+async def export_surgeries(
+    format: str = Query("csv", pattern="^(csv|ndjson|parquet)$"),
+    surgeon: str | None = None,
+    date_from: date | None = None,
+    date_to: date | None = None,
+    include_archive: bool = False,
+):
+    """Stream every matching surgery, batch by batch, with instrument minutes expanded"""
+    if format == "parquet" and not parquet_available():
+        raise HTTPException(status_code=400, detail="parquet export needs pyarrow installed")
+
+    async with readers.acquire() as db:
+        await catalog.load(db)
+        surgeon_entry = await catalog.resolve(db, "surgeon", surgeon) if surgeon else None
+    if surgeon and surgeon_entry is None:
+        raise HTTPException(status_code=404, detail="unknown surgeon")
+
+    where, params = "1 = 1", []
+    for clause, value in (
+        ("date >= ?", date_from.isoformat() if date_from else None),
+        ("date <= ?", date_to.isoformat() if date_to else None),
+    ):
+        if value is not None:
+            where += f" AND {clause}"
+            params.append(value)
+
+    # Every spelling of the surgeon shares the id. Rows archived before the
+    # catalog have none, so archives match the name too (legacy: name only).
+    hot, archived, legacy = (where, params), (where, params), (where, params)
+    if surgeon_entry:
+        hot = (f"{where} AND surgeon_id = ?", params + [surgeon_entry["id"]])
+        archived = (f"{where} AND (surgeon_id = ? OR surgeon_name = ?)",
+                    params + [surgeon_entry["id"], surgeon_entry["name"]])
+        legacy = (f"{where} AND surgeon_name = ?", params + [surgeon_entry["name"]])
+
+    instruments = [entry["name"] for entry in catalog.entries("instrument")]
+
+    def canonical(name: str) -> str:
+        entry = catalog.lookup("instrument", name)
+        return entry["name"] if entry else name
+
+    async def batches():
+        # One shard at a time, a reader per batch: a slow download neither
+        # holds a pooled reader nor keeps a read snapshot pinning the WAL.
+        # The archives are listed with the main database.
+        for number, pool in await shards.pools():
+            async for rows in row_batches(pool, *hot, EXPORT_BATCH_SIZE,
+                                          ARCHIVE_DB_FOLDER if include_archive and number == 0 else None,
+                                          archived, legacy):
+                yield rows
+
+    async def body():
+        if format == "csv":
+            chunks = encode_csv(batches(), instruments, canonical)
+        elif format == "ndjson":
+            chunks = encode_ndjson(batches(), canonical)
+        else:
+            chunks = encode_parquet(batches(), instruments, canonical)
+        async for chunk in chunks:
+            yield chunk
+
+    filename = f"surgeries_{date.today().isoformat()}.{format}"
+    return StreamingResponse(body(), media_type=FORMATS[format],
+                             headers={"Content-Disposition": f'attachment; filename="{filename}"'})
 
 
 @app.get("/config")
@@ -419,14 +997,147 @@ async def get_config():
     return {"watch_folder": str(WATCH_FOLDER)}
 
 
+@app.get("/catalog")
+async def get_catalog():
+    """Canonical surgeons, procedures and instruments with their ids and images"""
+    async with readers.acquire() as db:
+        await catalog.load(db)
+    return {f"{kind}s": catalog.entries(kind) for kind in KINDS}
+
+
+CATALOG_ID_COLUMNS = {"surgeon": "surgeon_id", "procedure": "procedure_id"}
+
+
+@app.post("/catalog/aliases")
+async def add_catalog_alias(
+    kind: str = Query(..., pattern="^(surgeon|procedure|instrument)$"),
+    alias: str = Query(..., min_length=1),
+    name: str = Query(..., min_length=1),
+):
+    """Make `alias` another spelling of `name`. Rows already stored under the
+    alias's own entry move to `name`'s; other workers reload the catalog."""
+    if not cluster.is_leader:
+        raise HTTPException(status_code=409, detail="catalog aliases are written by the leader worker")
+    result = await catalog.alias(writer, kind, alias, name)
+    if result is None:
+        raise HTTPException(status_code=400, detail="alias and name need letters or digits")
+    entry, previous = result
+    moved = 0
+    column = CATALOG_ID_COLUMNS.get(kind)
+    if previous is not None and column:
+        for shard_writer in shards.writers.values():
+            async with shard_writer.transaction() as db:
+                cursor = await db.execute(
+                    f"UPDATE surgeries SET {column} = ? WHERE {column} = ?", (entry["id"], previous)
+                )
+                moved += cursor.rowcount
+    await cluster.publish({"type": "catalog_changed"})
+    return {"entry": entry, "alias": catalog_key(alias), "rows_moved": moved}
+
+
+async def on_leader_message(message: dict):
+    """Followers: catalog changes reload the catalog, everything else goes to clients"""
+    if message.get("type") == "catalog_changed":
+        async with readers.acquire() as db:
+            await catalog.load(db)
+        return
+    await manager.broadcast(message)
+
+
+@app.get("/metrics")
+async def get_metrics():
+    return {
+        "worker": {"pid": os.getpid(), "leader": cluster.is_leader},
+        "event_loop": loop_lag.stats(),
+        "logging": logging_stats(),
+        "websocket": manager.stats(),
+        "alerts": detector.stats() if cluster.is_leader else None,
+        "watcher": {**file_handler.state.stats(), "parsers": len(file_handler.parsers)} if file_handler else None,
+        "database": {
+            "writer": writer.stats() if cluster.is_leader else None,
+            "readers": readers.stats(),
+            "shards": shards.stats(cluster.is_leader) if shards.enabled else None,
+        },
+    }
+
+
+async def live_snapshot() -> List[dict]:
+    """Current live surgeries as surgery_update messages for a newly connected client"""
+    async def live_rows(db):
+        cursor = await db.execute("SELECT * FROM surgeries WHERE is_live = 1")
+        return await cursor.fetchall()
+
+    rows = [r for shard_rows in await shards.fan_out(live_rows) for r in shard_rows]
+    messages = []
+    for r in rows:
+        row = _row_to_dict(r)
+        names = row["instruments_names"].split(",") if row["instruments_names"] else []
+        durations = row["instruments_durations"].split(",") if row["instruments_durations"] else []
+        messages.append({
+            "type": "surgery_update",
+            "surgery": {
+                "procedure_name": row["procedure_name"], "date": row["date"], "time": row["time"],
+                "duration": row["duration"], "surgeon_name": row["surgeon_name"],
+                "patient_info": row["patient_info"], "clutch_count": row["clutch_count"],
+                "instruments": {n: {"duration": float(d), "count": 0} for n, d in zip(names, durations)},
+                "is_ended": False,
+            },
+            "surgeon_name": row["surgeon_name"],
+            "surgery_id": row["id"],
+            "status": "live",
+        })
+    return messages
+
+
+# ========================================
+# DEBUG (enabled with MISSO_TRACING=1)
+# ========================================
+profile_lock = asyncio.Lock()
+
+
+@app.get("/debug/slow")
+async def get_slow_operations():
+    if not tracer.enabled:
+        raise HTTPException(status_code=404, detail="tracing disabled")
+    return tracer.slowest()
+
+
+@app.get("/debug/profile", response_class=PlainTextResponse)
+async def profile_event_loop(seconds: float = Query(5, gt=0, le=60)):
+    """Sample the event loop thread and return collapsed stacks for flame graphs"""
+    if not tracer.enabled:
+        raise HTTPException(status_code=404, detail="tracing disabled")
+    if profile_lock.locked():
+        raise HTTPException(status_code=409, detail="a profile is already running")
+    async with profile_lock:
+        return await asyncio.to_thread(sample_thread, threading.get_ident(), seconds)
+
+
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
     await manager.connect(websocket)
     try:
-        while True:
-            await websocket.receive_text()  # keep connection alive
-    except WebSocketDisconnect:
-        manager.disconnect(websocket)
+        for message in await live_snapshot():
+            manager.send(websocket, message)
+    except Exception as e:
+        logger.error(f"Snapshot error: {e}")
+    try:
+        # The manager drops a client on a send error or outbox overflow;
+        # stop reading from it then rather than serve a dead socket
+        while manager.is_connected(websocket):
+            text = await websocket.receive_text()
+            if not manager.is_connected(websocket):
+                break
+            reply = manager.handle_client_message(websocket, text)
+            if reply:
+                manager.send(websocket, reply)
+    except (WebSocketDisconnect, RuntimeError):
+        pass  # RuntimeError: receiving on a socket the manager already closed
+    finally:
+        if manager.is_connected(websocket):
+            manager.disconnect(websocket)
+        else:
+            await manager.close(websocket)
 
 # ========================================
 # LIFECYCLE
@@ -434,8 +1145,29 @@ async def websocket_endpoint(websocket: WebSocket):
 @app.on_event("startup")
 async def startup_event():
     loop = asyncio.get_running_loop()
-    threading.Thread(target=start_file_watcher, args=(loop,), daemon=True).start()
-    logger.info("Server startup complete")
+    background_tasks.append(asyncio.create_task(loop_lag.run()))
+
+    async def on_promoted():
+        global file_handler
+        # Only the leader touches the schema and ingests the watch folder
+        init_db()
+        await shards.load(migrate=True)
+        await writer.open()
+        async with writer.transaction() as db:
+            await catalog.load(db)
+            await sketch_store.load(db)
+        file_handler = SurgeryFileHandler(loop)
+        live_ids = await file_handler.restore()
+        threading.Thread(target=start_file_watcher, args=(file_handler,), daemon=True).start()
+        background_tasks.append(asyncio.create_task(file_handler.catch_up(live_ids)))
+        background_tasks.append(asyncio.create_task(live_clock.run(LIVE_TICK_INTERVAL, publish)))
+        if RETENTION_DAYS > 0:
+            background_tasks.append(asyncio.create_task(
+                run_retention(shards.paths, ARCHIVE_DB_FOLDER, RETENTION_DAYS, RETENTION_INTERVAL)
+            ))
+
+    await cluster.start(on_promoted=on_promoted, on_message=on_leader_message)
+    logger.info("Server startup complete (%s)", "leader" if cluster.is_leader else "follower")
 
 
 @app.on_event("shutdown")
@@ -444,9 +1176,18 @@ async def shutdown_event():
     if observer:
         observer.stop()
         observer.join()
+    if file_handler and file_handler.pool:
+        file_handler.pool.shutdown(cancel_futures=True)
+    for task in background_tasks:
+        task.cancel()
+    await cluster.stop()
+    await shards.close()  # the main writer and readers included
     logger.info("Server shutdown complete")
 
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host=HOST, port=PORT, log_level="info")
\ No newline at end of file
+    if WORKERS > 1:
+        uvicorn.run("main:app", host=HOST, port=PORT, workers=WORKERS, log_level="info")
+    else:
+        uvicorn.run(app, host=HOST, port=PORT, log_level="info")
\ No newline at end of file
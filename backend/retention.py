@@ -0,0 +1,141 @@
+import re
+import asyncio
+import logging
+import sqlite3
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Callable, List
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_ALIAS = "archive"
+
+
+def archive_path(archive_dir: Path, month: str) -> Path:
+    """Monthly archive file for a 'YYYY-MM' month"""
+    return archive_dir / f"surgeries_{month.replace('-', '_')}.db"
+
+
+def archive_files(archive_dir: Path) -> List[Path]:
+    """Archive files, newest month first"""
+    if not archive_dir.exists():
+        return []
+    return sorted(archive_dir.glob("surgeries_*.db"), reverse=True)
+
+
+def _columns(conn: sqlite3.Connection, schema: str) -> List[str]:
+    return [row[1] for row in conn.execute(f"PRAGMA {schema}.table_info(surgeries)")]
+
+
+def _ensure_archive_table(conn: sqlite3.Connection):
+    """Mirror the hot table's current definition into the attached archive"""
+    create_sql = conn.execute(
+        "SELECT sql FROM main.sqlite_master WHERE type = 'table' AND name = 'surgeries'"
+    ).fetchone()[0]
+    conn.execute(re.sub(
+        r"^CREATE TABLE\s+\"?surgeries\"?",
+        f"CREATE TABLE IF NOT EXISTS {ARCHIVE_ALIAS}.surgeries",
+        create_sql,
+    ))
+    # Archives created before a schema migration pick up the new columns lazily
+    archived = set(_columns(conn, ARCHIVE_ALIAS))
+    for row in conn.execute("PRAGMA main.table_info(surgeries)").fetchall():
+        if row[1] not in archived:
+            conn.execute(f"ALTER TABLE {ARCHIVE_ALIAS}.surgeries ADD COLUMN {row[1]} {row[2]}")
+    conn.execute(
+        f"CREATE INDEX IF NOT EXISTS {ARCHIVE_ALIAS}.idx_surgeries_surgeon_created "
+        f"ON surgeries (surgeon_name, created_at)"
+    )
+    conn.execute(
+        f"CREATE INDEX IF NOT EXISTS {ARCHIVE_ALIAS}.idx_surgeries_surgeon_id_created "
+        f"ON surgeries (surgeon_id, created_at)"
+    )
+
+
+def archive_old_surgeries(db_path: Path, archive_dir: Path, max_age_days: int) -> int:
+    """Move completed surgeries older than max_age_days into monthly archive files.
+
+    Runs synchronously – call it from a worker thread. Each month moves in
+    its own transaction, then freed pages are returned with an incremental
+    vacuum. Returns the number of rows moved.
+    """
+    cutoff = (date.today() - timedelta(days=max_age_days)).isoformat()
+    archive_dir.mkdir(exist_ok=True)
+    conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+    moved = 0
+    try:
+        months = [row[0] for row in conn.execute(
+            "SELECT DISTINCT substr(date, 1, 7) FROM surgeries WHERE is_live = 0 AND date != '' AND date < ?",
+            (cutoff,),
+        )]
+        for month in months:
+            conn.execute(f"ATTACH DATABASE ? AS {ARCHIVE_ALIAS}", (str(archive_path(archive_dir, month)),))
+            try:
+                _ensure_archive_table(conn)
+                columns = ", ".join(_columns(conn, "main"))
+                # Logs without a "Surgery started" event leave date empty, which
+                # sorts before any cutoff; those rows have no age and stay put
+                where = "is_live = 0 AND date != '' AND date < ? AND substr(date, 1, 7) = ?"
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    conn.execute(
+                        f"INSERT OR REPLACE INTO {ARCHIVE_ALIAS}.surgeries ({columns}) "
+                        f"SELECT {columns} FROM main.surgeries WHERE {where}",
+                        (cutoff, month),
+                    )
+                    count = conn.execute(f"DELETE FROM main.surgeries WHERE {where}", (cutoff, month)).rowcount
+                    conn.execute("COMMIT")
+                except Exception:
+                    conn.execute("ROLLBACK")
+                    raise
+                moved += count
+                logger.info("Archived %d surgeries from %s", count, month)
+            finally:
+                conn.execute(f"DETACH DATABASE {ARCHIVE_ALIAS}")
+
+        conn.execute("PRAGMA incremental_vacuum")
+    finally:
+        conn.close()
+    return moved
+
+
+async def fetch_from_archives(db, archive_dir: Path, sql: str, params: tuple, limit: int,
+                              legacy: tuple | None = None) -> list:
+    """Run `sql` against each archive, newest month first, until `limit` rows.
+
+    Each file is attached to the open connection as `archive` only for its
+    own query; `sql` reads `archive.surgeries` and ends in `LIMIT ?`.
+    `legacy` is a (sql, params) pair for archives last written before the
+    catalog, whose tables lack the columns `sql` refers to.
+    """
+    rows = []
+    for path in archive_files(archive_dir):
+        await db.execute(f"ATTACH DATABASE ? AS {ARCHIVE_ALIAS}", (str(path),))
+        try:
+            try:
+                cursor = await db.execute(sql, (*params, limit - len(rows)))
+            except sqlite3.OperationalError:
+                if legacy is None:
+                    raise
+                cursor = await db.execute(legacy[0], (*legacy[1], limit - len(rows)))
+            rows += await cursor.fetchall()
+        finally:
+            await db.execute(f"DETACH DATABASE {ARCHIVE_ALIAS}")
+        if len(rows) >= limit:
+            break
+    return rows
+
+
+async def run_retention(db_paths: Callable[[], List[Path]], archive_dir: Path, max_age_days: int,
+                        interval: float):
+    """Archive each database returned by `db_paths` in turn. Shards share the
+    monthly archive files; their surgery ids never collide."""
+    while True:
+        for db_path in db_paths():
+            try:
+                moved = await asyncio.to_thread(archive_old_surgeries, db_path, archive_dir, max_age_days)
+                if moved:
+                    logger.info("Retention moved %d surgeries from %s to %s", moved, db_path.name, archive_dir)
+            except Exception as e:
+                logger.error(f"Retention error: {e}", exc_info=True)
+        await asyncio.sleep(interval)
@@ -0,0 +1,139 @@
+import time
+import asyncio
+import sqlite3
+import logging
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, TypeVar
+
+from catalog import catalog_key
+from database import DatabaseWriter, ReaderPool, init_shard_db
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+SHARD_ID_SPAN = 1 << 40  # surgery ids of shard n start above n * SHARD_ID_SPAN
+REFRESH_INTERVAL = 2.0  # seconds between re-reading the shard list on read-only workers
+
+
+def shard_of(surgery_id: int) -> int:
+    return surgery_id // SHARD_ID_SPAN
+
+
+class ShardRouter:
+    """Routes surgery writes to their theater's database and fans reads out.
+
+    Shard 0 is the main database. It keeps the catalog, checkpoints,
+    sketches and every surgery written before sharding was switched on
+    (or all of them when it is off). With a shard folder each theater gets
+    its own file and its own writer, so rooms no longer queue behind one
+    SQLite write lock. Shards are numbered in the main database's `shards`
+    table and hand out ids from number * SHARD_ID_SPAN, so an id alone says
+    which file holds the row.
+    """
+
+    def __init__(self, writer: DatabaseWriter, readers: ReaderPool, folder: Path | None, pool_size: int):
+        self.folder = folder
+        self.pool_size = pool_size
+        self.writers: Dict[int, DatabaseWriter] = {0: writer}
+        self.readers: Dict[int, ReaderPool] = {0: readers}
+        self._numbers: Dict[str, int] = {}  # theater key → shard number
+        self._refreshed = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return self.folder is not None
+
+    def _path(self, key: str) -> Path:
+        return self.folder / f"{key}.db"
+
+    def _attach(self, number: int, key: str):
+        self._numbers[key] = number
+        if number not in self.readers:
+            path = self._path(key)
+            self.writers[number] = DatabaseWriter(path)
+            self.readers[number] = ReaderPool(path, self.pool_size)
+
+    async def load(self, migrate: bool = False):
+        """Pick up shards registered so far; the leader also brings their schema up to date"""
+        if not self.enabled:
+            return
+        try:
+            async with self.readers[0].acquire() as db:
+                cursor = await db.execute("SELECT number, key FROM shards")
+                rows = await cursor.fetchall()
+        except sqlite3.OperationalError:  # the leader has not created the table yet
+            return
+        for number, key in rows:
+            if migrate:
+                await asyncio.to_thread(init_shard_db, self._path(key), number * SHARD_ID_SPAN)
+            self._attach(number, key)
+        self._refreshed = time.monotonic()
+
+    async def _refresh(self):
+        if self.enabled and time.monotonic() - self._refreshed > REFRESH_INTERVAL:
+            await self.load()
+
+    # ─── Writes (leader) ───
+    async def writer_for(self, theater: str) -> DatabaseWriter:
+        """The writer owning a theater's surgeries, creating its shard on first use"""
+        key = catalog_key(theater)
+        if not self.enabled or not key:
+            return self.writers[0]
+        number = self._numbers.get(key)
+        if number is None:
+            number = await self._register(key, theater)
+        return self.writers[number]
+
+    async def _register(self, key: str, theater: str) -> int:
+        self.folder.mkdir(parents=True, exist_ok=True)
+        async with self.writers[0].transaction() as db:
+            await db.execute("INSERT OR IGNORE INTO shards (key, theater) VALUES (?, ?)", (key, theater))
+            cursor = await db.execute("SELECT number FROM shards WHERE key = ?", (key,))
+            number = (await cursor.fetchone())[0]
+            # The file exists before the row commits, so other workers never see a missing shard
+            await asyncio.to_thread(init_shard_db, self._path(key), number * SHARD_ID_SPAN)
+        self._attach(number, key)
+        logger.info("New shard %s for theater %r", number, theater)
+        return number
+
+    def writer_for_id(self, surgery_id: int) -> DatabaseWriter:
+        return self.writers.get(shard_of(surgery_id), self.writers[0])
+
+    # ─── Reads ───
+    async def readers_for_id(self, surgery_id: int) -> ReaderPool | None:
+        number = shard_of(surgery_id)
+        if number not in self.readers:
+            self._refreshed = 0.0
+            await self._refresh()
+        return self.readers.get(number)
+
+    async def pools(self) -> List[tuple]:
+        """(shard number, reader pool) for every shard, main database first"""
+        await self._refresh()
+        return [(number, self.readers[number]) for number in sorted(self.readers)]
+
+    async def fan_out(self, query: Callable[..., Awaitable[T]]) -> List[T]:
+        """Run `query(db)` on every shard in parallel; results in shard order"""
+        async def one(pool: ReaderPool) -> T:
+            async with pool.acquire() as db:
+                return await query(db)
+
+        return list(await asyncio.gather(*(one(pool) for _, pool in await self.pools())))
+
+    def paths(self) -> List[Path]:
+        return [self.writers[n].path for n in sorted(self.writers)]
+
+    async def close(self):
+        for number in sorted(self.writers):
+            await self.writers[number].close()
+            await self.readers[number].close()
+
+    def stats(self, leader: bool) -> dict:
+        return {
+            str(number): {
+                "writer": self.writers[number].stats() if leader else None,
+                "readers": self.readers[number].stats(),
+            }
+            for number in sorted(self.readers)
+        }
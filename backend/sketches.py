@@ -0,0 +1,217 @@
+import math
+import struct
+import logging
+from array import array
+from typing import Dict, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+# ========================================
+# QUANTILE SKETCH
+# ========================================
+class QuantileSketch:
+    """Mergeable quantile sketch with relative-error buckets (DDSketch).
+
+    Values land in logarithmic buckets of width `relative_accuracy`, so any
+    quantile is within that fraction of the true value. Two sketches merge
+    by adding bucket counts. Once there are more than `max_buckets`, the
+    lowest ones collapse together, which only costs accuracy at the
+    uninteresting low tail. Rank and quantile queries walk at most
+    `max_buckets` entries, whatever the number of samples.
+    """
+
+    _HEADER = struct.Struct("<dIII")  # accuracy, max buckets, zero count, bucket count
+
+    def __init__(self, relative_accuracy: float = 0.02, max_buckets: int = 512):
+        self.relative_accuracy = relative_accuracy
+        self.max_buckets = max_buckets
+        self._gamma = math.log((1 + relative_accuracy) / (1 - relative_accuracy))
+        self.zero_count = 0  # values too small for a log bucket
+        self.buckets: Dict[int, int] = {}
+        self.count = 0
+
+    def _index(self, value: float) -> int:
+        return math.ceil(math.log(value) / self._gamma)
+
+    def _value(self, index: int) -> float:
+        return 2 * math.exp(index * self._gamma) / (1 + math.exp(self._gamma))
+
+    def add(self, value: float, weight: int = 1):
+        if value <= 1e-9:
+            self.zero_count += weight
+        else:
+            index = self._index(value)
+            self.buckets[index] = self.buckets.get(index, 0) + weight
+            if len(self.buckets) > self.max_buckets:
+                self._collapse()
+        self.count += weight
+
+    def _collapse(self):
+        lowest = sorted(self.buckets)[: len(self.buckets) - self.max_buckets + 1]
+        self.buckets[lowest[-1]] += sum(self.buckets.pop(i) for i in lowest[:-1])
+
+    def merge(self, other: "QuantileSketch"):
+        self.zero_count += other.zero_count
+        for index, count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+        self.count += other.count
+        if len(self.buckets) > self.max_buckets:
+            self._collapse()
+
+    def quantile(self, q: float) -> float | None:
+        if not self.count:
+            return None
+        target = int(q * (self.count - 1) + 0.5)  # nearest rank
+        seen = self.zero_count
+        if seen > target:
+            return 0.0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen > target:
+                return self._value(index)
+        return self._value(max(self.buckets))
+
+    def percentile_of(self, value: float) -> float | None:
+        """Share of samples below `value`, 0–100; ties count half"""
+        if not self.count:
+            return None
+        if value <= 1e-9:
+            below, tied = 0, self.zero_count
+        else:
+            target = self._index(value)
+            below = self.zero_count + sum(c for i, c in self.buckets.items() if i < target)
+            tied = self.buckets.get(target, 0)
+        return round(100 * (below + tied / 2) / self.count, 1)
+
+    # ─── Persistence ───
+    def to_bytes(self) -> bytes:
+        indexes = sorted(self.buckets)
+        return (
+            self._HEADER.pack(self.relative_accuracy, self.max_buckets, self.zero_count, len(indexes))
+            + array("i", indexes).tobytes()
+            + array("I", (self.buckets[i] for i in indexes)).tobytes()
+        )
+
+    @classmethod
+    def from_bytes(cls, blob: bytes) -> "QuantileSketch":
+        accuracy, max_buckets, zero_count, size = cls._HEADER.unpack_from(blob)
+        sketch = cls(accuracy, max_buckets)
+        offset = cls._HEADER.size
+        indexes = array("i")
+        indexes.frombytes(blob[offset: offset + 4 * size])
+        counts = array("I")
+        counts.frombytes(blob[offset + 4 * size: offset + 8 * size])
+        sketch.zero_count = zero_count
+        sketch.buckets = dict(zip(indexes, counts))
+        sketch.count = zero_count + sum(counts)
+        return sketch
+
+
+# ========================================
+# PER SURGEON + PROCEDURE STORE
+# ========================================
+SketchKey = Tuple[int, int, str]  # surgeon id, procedure id, metric
+
+
+def surgery_metrics(surgery: dict) -> Dict[str, float]:
+    """The values a surgery contributes: duration, clutches per minute and
+    minutes on each catalogued instrument"""
+    metrics = {"duration": float(surgery["duration"])}
+    if surgery["duration"] > 0:
+        metrics["clutch_rate"] = surgery["clutch_count"] / surgery["duration"]
+    for inst in surgery["instruments"].values():
+        if inst.get("id") is not None:
+            metrics[f"instrument:{inst['id']}"] = float(inst["duration"])
+    return metrics
+
+
+class SketchStore:
+    """Historical distributions of completed surgeries per surgeon and procedure.
+
+    Sketches live in memory for lookups on every live update and are written
+    to `surgery_sketches` as they change. A fresh table is seeded once from
+    the completed surgeries already in the database.
+    """
+
+    def __init__(self):
+        self.sketches: Dict[SketchKey, QuantileSketch] = {}
+
+    async def load(self, db):
+        cursor = await db.execute("SELECT surgeon_id, procedure_id, metric, sketch FROM surgery_sketches")
+        rows = await cursor.fetchall()
+        self.sketches = {(r[0], r[1], r[2]): QuantileSketch.from_bytes(r[3]) for r in rows}
+        if not rows:
+            await self._seed(db)
+
+    async def _seed(self, db):
+        # Completion used to leave the live row behind, flipped to is_live = 0,
+        # next to the final row for the same start; only the final row counts
+        cursor = await db.execute("""
+            SELECT surgeon_id, procedure_id, duration, clutch_count, instrument_ids, instruments_durations
+            FROM surgeries s
+            WHERE is_live = 0 AND surgeon_id IS NOT NULL AND procedure_id IS NOT NULL
+              AND NOT EXISTS (
+                  SELECT 1 FROM surgeries later
+                  WHERE later.surgeon_id = s.surgeon_id AND later.date = s.date
+                    AND later.time = s.time AND later.id > s.id
+              )
+        """)
+        for surgeon_id, procedure_id, duration, clutch_count, ids, durations in await cursor.fetchall():
+            instruments = {
+                i: {"id": int(inst_id), "duration": float(minutes)}
+                for i, (inst_id, minutes) in enumerate(zip((ids or "").split(","), (durations or "").split(",")))
+                if inst_id and minutes
+            }
+            self._add(surgeon_id, procedure_id, surgery_metrics(
+                {"duration": duration, "clutch_count": clutch_count, "instruments": instruments}
+            ))
+        if self.sketches:
+            await self._save(db, self.sketches)
+            logger.info("Seeded %d percentile sketches from history", len(self.sketches))
+
+    def _add(self, surgeon_id: int, procedure_id: int, metrics: Dict[str, float]) -> Dict[SketchKey, QuantileSketch]:
+        changed = {}
+        for metric, value in metrics.items():
+            key = (surgeon_id, procedure_id, metric)
+            sketch = self.sketches.setdefault(key, QuantileSketch())
+            sketch.add(value)
+            changed[key] = sketch
+        return changed
+
+    async def _save(self, db, sketches: Dict[SketchKey, QuantileSketch]):
+        await db.executemany("""
+            INSERT INTO surgery_sketches (surgeon_id, procedure_id, metric, sketch) VALUES (?, ?, ?, ?)
+            ON CONFLICT (surgeon_id, procedure_id, metric) DO UPDATE SET sketch = excluded.sketch
+        """, [(*key, sketch.to_bytes()) for key, sketch in sketches.items()])
+
+    async def record(self, db, surgery: dict):
+        """Fold a completed surgery into its surgeon/procedure sketches"""
+        changed = self._add(surgery["surgeon_id"], surgery["procedure_id"], surgery_metrics(surgery))
+        await self._save(db, changed)
+
+    def percentiles(self, surgery: dict) -> dict | None:
+        """Where a (live) surgery sits in its surgeon's history for the procedure"""
+        surgeon_id, procedure_id = surgery.get("surgeon_id"), surgery.get("procedure_id")
+        history = self.sketches.get((surgeon_id, procedure_id, "duration"))
+        if history is None:
+            return None
+        metrics = surgery_metrics(surgery)
+        result = {
+            "samples": history.count,
+            "median_duration": round(history.quantile(0.5), 1),
+            "duration": history.percentile_of(metrics["duration"]),
+            "clutch_rate": None,
+            "instruments": {},
+        }
+        clutch_rate = self.sketches.get((surgeon_id, procedure_id, "clutch_rate"))
+        if clutch_rate and "clutch_rate" in metrics:
+            result["clutch_rate"] = clutch_rate.percentile_of(metrics["clutch_rate"])
+        for name, inst in surgery["instruments"].items():
+            sketch = self.sketches.get((surgeon_id, procedure_id, f"instrument:{inst.get('id')}"))
+            if sketch:
+                result["instruments"][name] = sketch.percentile_of(inst["duration"])
+        return result
+
+    def __len__(self) -> int:
+        return len(self.sketches)
@@ -0,0 +1,90 @@
+import json
+import time
+import hashlib
+from collections import Counter, OrderedDict
+from typing import Any, Callable, Hashable
+
+
+def digest(value: Any) -> bytes:
+    """16-byte fingerprint of a JSON-serialisable value"""
+    return hashlib.blake2b(json.dumps(value, sort_keys=True, default=str).encode(), digest_size=16).digest()
+
+
+class StateStore:
+    """Bounded key → value map with a per-entry time to live and LRU eviction.
+
+    Reading or writing an entry makes it the most recently used; once more
+    than `max_entries` are held the least recently used goes, and entries
+    past their TTL disappear on access or on `sweep()`. `on_evict(key, value)`
+    runs for entries dropped either way, but not for explicit `pop`s.
+    Keys are conventionally (kind, name) tuples, which the stats group by.
+    Not thread-safe – use it from the event loop thread only.
+    """
+
+    def __init__(self, max_entries: int, ttl: float,
+                 on_evict: Callable[[Hashable, Any], None] | None = None,
+                 clock: Callable[[], float] = time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.on_evict = on_evict
+        self.clock = clock
+        self._entries: OrderedDict[Hashable, tuple] = OrderedDict()  # key → (expires at, value)
+        self.hits = self.misses = self.expired = self.evicted = 0
+
+    def _drop(self, key: Hashable):
+        _, value = self._entries.pop(key)
+        if self.on_evict:
+            self.on_evict(key, value)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] <= self.clock():
+            self._drop(key)
+            self.expired += 1
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return default
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key: Hashable, value: Any, ttl: float | None = None):
+        self._entries[key] = (self.clock() + (self.ttl if ttl is None else ttl), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._drop(next(iter(self._entries)))
+            self.evicted += 1
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._entries.pop(key, None)
+        return default if entry is None else entry[1]
+
+    def __contains__(self, key: Hashable) -> bool:
+        entry = self._entries.get(key)
+        return entry is not None and entry[0] > self.clock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def sweep(self) -> int:
+        """Drop every expired entry; returns how many went"""
+        now = self.clock()
+        stale = [key for key, (expires, _) in self._entries.items() if expires <= now]
+        for key in stale:
+            self._drop(key)
+        self.expired += len(stale)
+        return len(stale)
+
+    def stats(self) -> dict:
+        kinds = Counter(key[0] if isinstance(key, tuple) else "other" for key in self._entries)
+        return {
+            "entries": len(self._entries),
+            "capacity": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "by_kind": dict(kinds),
+            "hits": self.hits,
+            "misses": self.misses,
+            "expired": self.expired,
+            "evicted": self.evicted,
+        }
@@ -0,0 +1,244 @@
+import json
+import hashlib
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from state_store import digest
+
+logger = logging.getLogger(__name__)
+
+
+def _parse_event_time(value) -> datetime | None:
+    """Event timestamps as naive local time, matching the 'Surgery started' value"""
+    try:
+        dt = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except (TypeError, ValueError):
+        return None
+    return dt.astimezone().replace(tzinfo=None) if dt.tzinfo else dt
+
+
+def _event_digest(event) -> str:
+    return hashlib.blake2b(json.dumps(event, sort_keys=True).encode(), digest_size=8).hexdigest()
+
+
+class SurgeryParser:
+    """Incremental parser for one surgery event log.
+
+    `feed` consumes events in log order and only keeps the running state, so
+    a log that grew can be continued from `events_seen` instead of being
+    parsed again. `to_state`/`from_state` round-trip that state through JSON
+    for crash-recovery checkpoints.
+    """
+
+    def __init__(self):
+        self.surgery: Dict[str, Any] = {
+            "procedure_name": "",
+            "date": "",
+            "time": "",
+            "duration": 0,
+            "surgeon_name": "",
+            "patient_info": "",
+            "instruments": {},
+            "clutch_count": 0,
+            "is_ended": False,
+            "end_timestamp": None,
+            "started_at": None,
+        }
+        self.start_time: datetime | None = None
+        self.current_instrument: str | None = None
+        self.connected_since: Dict[str, datetime] = {}  # instrument → connect time
+        self.arm_instruments: Dict[str, str] = {}  # arm position → instrument
+        self.clutch_offsets: List[int] = []  # ms after start_time, one per press
+        self.events_seen = 0
+        self.head_digest: str | None = None  # first and last consumed events, to
+        self.tail_digest: str | None = None  # tell an appended log from a new one
+
+    # ─── Resuming ───
+    def resumes(self, data: List[Any]) -> bool:
+        """Whether `data` is the log this parser consumed, possibly with more events"""
+        if self.events_seen == 0:
+            return True
+        if len(data) < self.events_seen:
+            return False
+        return (_event_digest(data[0]) == self.head_digest
+                and _event_digest(data[self.events_seen - 1]) == self.tail_digest)
+
+    def starts_with(self, first_event: Any) -> bool:
+        """Whether a log whose first event is `first_event` is the one being consumed"""
+        return self.events_seen == 0 or _event_digest(first_event) == self.head_digest
+
+    def feed(self, events: List[Any]) -> "SurgeryParser":
+        if not events:
+            return self
+        if self.events_seen == 0:
+            self.head_digest = _event_digest(events[0])
+        for event in events:
+            if isinstance(event, dict):
+                self._apply(event)
+        self.events_seen += len(events)
+        self.tail_digest = _event_digest(events[-1])
+        return self
+
+    def _apply(self, event: Dict[str, Any]):
+        surgery = self.surgery
+        event_type = event.get("event", "")
+        value = event.get("value", "")
+        event_time_str = event.get("time")
+
+        # ─── Detect final log marker ───
+        if event_type == "Log file ended" and value == "Now":
+            surgery["is_ended"] = True
+            try:
+                surgery["end_timestamp"] = datetime.fromisoformat(event_time_str)
+            except:
+                surgery["end_timestamp"] = datetime.now()
+            return
+
+        if event_type == "Surgery type selected":
+            surgery["procedure_name"] = str(value)
+
+        elif event_type == "Surgeon Name":
+            surgery["surgeon_name"] = str(value)
+
+        elif event_type == "Patient Info":
+            surgery["patient_info"] = str(value)
+
+        elif event_type == "Surgery started":
+            try:
+                dt = datetime.strptime(value, "%Y-%m-%d %H:%M:%S")
+                surgery["date"] = dt.strftime("%Y-%m-%d")
+                surgery["time"] = dt.strftime("%H:%M")
+                surgery["started_at"] = dt.isoformat()
+                self.start_time = dt
+            except Exception as e:
+                logger.error(f"Start time parse error: {e}")
+
+        elif event_type == "Surgery stopped":
+            try:
+                stop_time = datetime.strptime(value, "%Y-%m-%d %H:%M:%S")
+                if self.start_time:
+                    surgery["duration"] = int((stop_time - self.start_time).total_seconds() / 60)
+                    surgery["is_ended"] = True
+                    surgery["end_timestamp"] = stop_time
+            except Exception as e:
+                logger.error(f"Stop time parse error: {e}")
+
+        elif event_type == "Surgery duration" and surgery["duration"] == 0:
+            try:
+                h, m, _ = map(int, value.split(":"))
+                surgery["duration"] = h * 60 + m
+            except:
+                pass
+
+        elif event_type == "Clutch Pedal Pressed":
+            surgery["clutch_count"] += 1
+            pressed_at = _parse_event_time(event_time_str)
+            if pressed_at and self.start_time and pressed_at >= self.start_time:
+                self.clutch_offsets.append(int((pressed_at - self.start_time).total_seconds() * 1000))
+
+        elif "Instrument Name" in event_type:
+            self.current_instrument = str(value)
+            if self.current_instrument not in surgery["instruments"]:
+                surgery["instruments"][self.current_instrument] = {"duration": 0, "count": 0}
+            # Mounting on an arm swaps out whatever was on it – logs rarely say "removed"
+            arm = event_type.replace(" Instrument Name", "")
+            previous = self.arm_instruments.pop(arm, None)
+            if previous is not None and previous not in self.arm_instruments.values():
+                self.connected_since.pop(previous, None)
+            connected_at = _parse_event_time(event_time_str)
+            if connected_at:
+                self.connected_since[self.current_instrument] = connected_at
+                self.arm_instruments[arm] = self.current_instrument
+
+        elif "Instrument removed" in event_type:
+            removed = self.arm_instruments.pop(event_type.replace(" Instrument removed", ""), None)
+            self.connected_since.pop(removed, None)
+
+        elif "Instrument Connected duration is" in event_type and self.current_instrument:
+            try:
+                sec = float(value)
+                surgery["instruments"][self.current_instrument]["duration"] = round(sec / 60, 2)
+            except:
+                pass
+
+        elif "Instrument Count is" in event_type and self.current_instrument:
+            try:
+                surgery["instruments"][self.current_instrument]["count"] = int(value)
+            except:
+                pass
+
+    # ─── Output ───
+    def snapshot(self, now: Optional[datetime] = None) -> Dict[str, Any]:
+        """The surgery as of `now`, with live durations filled in"""
+        now = now or datetime.now()
+        surgery = dict(self.surgery)
+        surgery["instruments"] = {name: dict(inst) for name, inst in self.surgery["instruments"].items()}
+
+        # Final duration calculation
+        if surgery["is_ended"] and self.start_time and surgery["end_timestamp"]:
+            surgery["duration"] = max(0, int((surgery["end_timestamp"] - self.start_time).total_seconds() / 60))
+        elif self.start_time and not surgery["is_ended"]:
+            surgery["duration"] = max(0, int((now - self.start_time).total_seconds() / 60))
+
+        # Instruments still connected on a live surgery – the ticker keeps these current
+        if not surgery["is_ended"]:
+            for name, since in self.connected_since.items():
+                surgery["instruments"][name]["active_since"] = since.isoformat()
+                surgery["instruments"][name]["active_duration"] = round(
+                    max(0.0, (now - since).total_seconds()) / 60, 2
+                )
+
+        return surgery
+
+    # ─── Checkpoints ───
+    def to_state(self) -> Dict[str, Any]:
+        end = self.surgery["end_timestamp"]
+        return {
+            "surgery": {**self.surgery, "end_timestamp": end.isoformat() if end else None},
+            "start_time": self.start_time.isoformat() if self.start_time else None,
+            "current_instrument": self.current_instrument,
+            "connected_since": {k: v.isoformat() for k, v in self.connected_since.items()},
+            "arm_instruments": self.arm_instruments,
+            "clutch_offsets": self.clutch_offsets,
+            "events_seen": self.events_seen,
+            "head_digest": self.head_digest,
+            "tail_digest": self.tail_digest,
+        }
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Any]) -> "SurgeryParser":
+        parser = cls()
+        surgery = dict(state["surgery"])
+        if surgery.get("end_timestamp"):
+            surgery["end_timestamp"] = datetime.fromisoformat(surgery["end_timestamp"])
+        parser.surgery.update(surgery)
+        if state.get("start_time"):
+            parser.start_time = datetime.fromisoformat(state["start_time"])
+        parser.current_instrument = state.get("current_instrument")
+        parser.connected_since = {
+            k: datetime.fromisoformat(v) for k, v in state.get("connected_since", {}).items()
+        }
+        parser.arm_instruments = dict(state.get("arm_instruments", {}))
+        parser.clutch_offsets = list(state.get("clutch_offsets", []))
+        parser.events_seen = state.get("events_seen", 0)
+        parser.head_digest = state.get("head_digest")
+        parser.tail_digest = state.get("tail_digest")
+        return parser
+
+
+def update_digest(surgery: Dict[str, Any]) -> bytes:
+    """What a live update shows, minus the connected-instrument clocks the ticker
+    keeps – which instruments are connected, and since when, is part of it"""
+    return digest([
+        surgery["procedure_name"], surgery["patient_info"], surgery["duration"],
+        surgery["clutch_count"], surgery["is_ended"],
+        {name: [inst["duration"], inst["count"], inst.get("active_since")]
+         for name, inst in surgery["instruments"].items()},
+    ])
+
+
+def parse_surgery_json(data: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Parse surgery events and detect end status"""
+    return SurgeryParser().feed(data).snapshot()
+
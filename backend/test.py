@@ -13,8 +13,10 @@ from fastapi.middleware.cors import CORSMiddleware
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
 
-from database import init_db, get_db
-from config import WATCH_FOLDER, HOST, PORT
+import aiosqlite
+
+from database import init_db
+from config import DB_PATH, WATCH_FOLDER, HOST, PORT
 
 # ========================================
 # SETUP
@@ -23,6 +25,14 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(
 logger = logging.getLogger(__name__)
 init_db()
 
+
+async def get_db():
+    """Get async database connection"""
+    db = await aiosqlite.connect(DB_PATH)
+    db.row_factory = aiosqlite.Row
+    return db
+
+
 ARCHIVE_FOLDER = WATCH_FOLDER.parent / "completed_surgeries"
 ARCHIVE_FOLDER.mkdir(exist_ok=True)
 
@@ -0,0 +1,109 @@
+from datetime import datetime, timedelta
+
+from anomalies import AnomalyDetector, merge_rules
+from sketches import QuantileSketch
+from surgery_parser import SurgeryParser
+
+START = datetime(2025, 1, 6, 8, 0, 0)
+RULES = {
+    "clutch_rate_spike": {"window_seconds": 60, "per_minute": 3},
+    "instrument_connected_long": {"minutes": 90},
+    "duration_beyond_norm": {"percentile": 95, "margin_minutes": 5, "min_samples": 10},
+}
+
+
+def _at(seconds: float) -> str:
+    return (START + timedelta(seconds=seconds)).isoformat()
+
+
+def _events(procedure: str = "Nephrectomy") -> list:
+    return [
+        {"time": _at(0), "event": "Surgery type selected", "value": procedure},
+        {"time": _at(0), "event": "Surgeon Name", "value": "Dr.Raj"},
+        {"time": _at(0), "event": "Surgery started", "value": START.strftime("%Y-%m-%d %H:%M:%S")},
+    ]
+
+
+def _clutches(*seconds: float) -> list:
+    return [{"time": _at(s), "event": "Clutch Pedal Pressed", "value": "1"} for s in seconds]
+
+
+def _observe(detector, parser, minutes: float, history=None) -> list:
+    now = START + timedelta(minutes=minutes)
+    surgery = {**parser.snapshot(now=now), "surgeon_id": 1, "procedure_id": 2}
+    return detector.observe("theater_a.json", parser, surgery, history, now=now)
+
+
+def _rules(*names) -> AnomalyDetector:
+    return AnomalyDetector({name: RULES[name] for name in names})
+
+
+# ─── Clutch rate ───
+def test_clutch_spike_fires_once_and_rearms_when_the_rate_drops():
+    detector = _rules("clutch_rate_spike")
+    parser = SurgeryParser().feed(_events() + _clutches(10, 20, 30))
+
+    [alert] = _observe(detector, parser, 1)
+    assert (alert["rule"], alert["value"], alert["limit"]) == ("clutch_rate_spike", 3.0, 3)
+    assert _observe(detector, parser.feed(_clutches(40)), 1) == []  # still the same spike
+    assert _observe(detector, parser.feed(_clutches(600)), 10) == []
+    assert [a["rule"] for a in _observe(detector, parser.feed(_clutches(610, 620)), 11)] == ["clutch_rate_spike"]
+    assert detector.fired["clutch_rate_spike"] == 2
+
+
+def test_presses_outside_the_window_do_not_add_up():
+    detector = _rules("clutch_rate_spike")
+    parser = SurgeryParser().feed(_events() + _clutches(0, 50, 110, 170, 230))
+
+    assert _observe(detector, parser, 4) == []
+
+
+# ─── Connected instruments ───
+def test_long_connection_alerts_per_instrument_and_rearms_on_removal():
+    detector = _rules("instrument_connected_long")
+    parser = SurgeryParser().feed(_events() + [
+        {"time": _at(60), "event": "PrimaryLeft Instrument Name", "value": "SynchroSeal"},
+    ])
+
+    [alert] = _observe(detector, parser, 95)
+    assert alert["subject"] == "SynchroSeal" and alert["value"] == 94.0
+    assert _observe(detector, parser, 100) == []
+    parser.feed([{"time": _at(6000), "event": "PrimaryRight Instrument Name", "value": "Potts_Scissors"},
+                 {"time": _at(6000), "event": "PrimaryLeft Instrument removed", "value": "SynchroSeal"},
+                 {"time": _at(6060), "event": "PrimaryLeft Instrument Name", "value": "SynchroSeal"}])
+    assert _observe(detector, parser, 160) == []  # reconnected 59 minutes ago
+    assert [a["subject"] for a in _observe(detector, parser, 200)] == ["Potts_Scissors", "SynchroSeal"]
+
+
+# ─── Duration ───
+def test_duration_beyond_the_surgeons_norm_needs_enough_history():
+    detector = _rules("duration_beyond_norm")
+    parser = SurgeryParser().feed(_events())
+    history = QuantileSketch()
+    for minutes in range(50, 59):
+        history.add(minutes)
+
+    assert _observe(detector, parser, 90, history) == []  # 9 cases are not a norm yet
+    history.add(60)
+    assert _observe(detector, parser, 60, history) == []
+    [alert] = _observe(detector, parser, 70, history)
+    assert alert["value"] == 70 and 63 < alert["limit"] < 66
+    assert "Nephrectomy" in alert["message"]
+
+
+def test_a_new_surgery_in_the_same_log_starts_over():
+    detector = _rules("clutch_rate_spike")
+    assert len(_observe(detector, SurgeryParser().feed(_events() + _clutches(10, 20, 30)), 1)) == 1
+    assert len(_observe(detector, SurgeryParser().feed(_events("Prostatectomy") + _clutches(10, 20, 30)), 1)) == 1
+    assert detector.stats()["live"] == 1
+
+
+# ─── Settings ───
+def test_overrides_are_laid_over_the_defaults():
+    rules = merge_rules(RULES, '{"clutch_rate_spike": {"per_minute": 15}, "unknown": {"x": 1}}')
+
+    assert rules["clutch_rate_spike"] == {"window_seconds": 60, "per_minute": 15}
+    assert "unknown" not in rules and RULES["clutch_rate_spike"]["per_minute"] == 3
+    assert AnomalyDetector({**rules, "duration_beyond_norm": {"enabled": False}}).stats()["rules"] == [
+        "clutch_rate_spike", "instrument_connected_long",
+    ]
@@ -0,0 +1,88 @@
+import asyncio
+import json
+
+from connections import ClientChannel, ConnectionManager, message_topics
+
+
+class StubSocket:
+    """Just enough of a WebSocket for the manager: records what is sent"""
+
+    client = None
+
+    def __init__(self):
+        self.sent = []
+        self.closed = False
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, text: str):
+        self.sent.append(json.loads(text))
+
+    async def close(self, code: int = 1000):
+        self.closed = True
+
+
+# ─── Per-client outbox ───
+def test_updates_for_the_same_surgery_coalesce_to_the_newest():
+    channel = ClientChannel(StubSocket(), max_pending=8)
+    channel.enqueue("surgery_update", 1, "first")
+    channel.enqueue("surgery_update", 2, "other surgery")
+    channel.enqueue("surgery_update", 1, "newest")
+
+    assert channel.pending == 2
+    assert channel.coalesced == 1
+    assert list(channel._pending.values()) == ["newest", "other surgery"]
+
+
+def test_full_outbox_drops_the_oldest_update_but_keeps_completions():
+    channel = ClientChannel(StubSocket(), max_pending=2)
+    channel.enqueue("surgery_complete", 1, "complete")
+    channel.enqueue("surgery_tick", 2, "tick")
+    assert channel.enqueue("surgery_complete", 3, "complete 3")
+
+    assert channel.dropped == 1
+    assert list(channel._pending.values()) == ["complete", "complete 3"]
+    assert not channel.enqueue("surgery_complete", 4, "complete 4")  # nothing left to drop
+
+
+# ─── Manager ───
+def test_topics_use_the_catalog_key():
+    assert message_topics({"surgeon_name": "Dr. Raj", "theater": "Theater A", "surgery_id": 7}) == [
+        "surgeon:dr_raj", "theater:theater_a", "surgery_id:7",
+    ]
+
+
+def test_subscribed_clients_only_get_their_topics():
+    async def scenario():
+        manager = ConnectionManager()
+        raj, everyone = StubSocket(), StubSocket()
+        await manager.connect(raj)
+        await manager.connect(everyone)
+        reply = manager.handle_client_message(raj, json.dumps({"action": "subscribe", "surgeon": "Dr.Raj"}))
+        await manager.broadcast({"type": "surgery_tick", "surgeon_name": "Dr. Raj", "surgery_id": 1})
+        await manager.broadcast({"type": "surgery_tick", "surgeon_name": "Dr. Meril", "surgery_id": 2})
+        await asyncio.sleep(0.01)
+        return reply, raj.sent, everyone.sent
+
+    reply, raj_sent, everyone_sent = asyncio.run(scenario())
+    assert reply == {"type": "subscriptions", "topics": ["surgeon:dr_raj"]}
+    assert [m["surgery_id"] for m in raj_sent] == [1]
+    assert [m["surgery_id"] for m in everyone_sent] == [1, 2]
+
+
+def test_dropped_client_cannot_subscribe():
+    async def scenario():
+        manager = ConnectionManager()
+        socket = StubSocket()
+        await manager.connect(socket)
+        manager.disconnect(socket)
+        reply = manager.handle_client_message(socket, json.dumps({"action": "subscribe", "surgeon": "Dr.Raj"}))
+        manager.subscribe(socket, ["surgeon:dr_raj"])
+        manager.unsubscribe(socket, ["surgeon:dr_raj"])
+        return manager, reply
+
+    manager, reply = asyncio.run(scenario())
+    assert reply is None
+    assert dict(manager.topics) == {}
+    assert manager.subscriptions == {} and manager.firehose == set()
@@ -0,0 +1,95 @@
+import json
+
+from log_reader import parse_json_log, read_json_array, read_ndjson
+from surgery_parser import SurgeryParser
+
+EVENTS = [
+    {"time": "2025-01-06T08:00:00", "event": "Surgeon Name", "value": "Dr.Raj"},
+    {"time": "2025-01-06T08:00:00", "event": "Surgery started", "value": "2025-01-06 08:00:00"},
+    {"time": "2025-01-06T08:01:00", "event": "Clutch Pedal Pressed", "value": "1"},
+    {"time": "2025-01-06T08:02:00", "event": "Clutch Pedal Pressed", "value": "2"},
+]
+MORE = [
+    {"time": "2025-01-06T08:03:00", "event": "Clutch Pedal Pressed", "value": "3"},
+    {"time": "2025-01-06T08:04:00", "event": "Clutch Pedal Pressed", "value": "4"},
+]
+
+
+def _lines(events) -> str:
+    return "".join(json.dumps(event) + "\n" for event in events)
+
+
+# ─── JSON array logs ───
+def test_grown_array_reads_only_the_appended_events(tmp_path):
+    path = tmp_path / "theater_a.json"
+    path.write_text(json.dumps(EVENTS, indent=2))
+    first = read_json_array(str(path))
+    path.write_text(json.dumps(EVENTS + MORE, indent=2))  # producers rewrite the whole array
+    grown = read_json_array(str(path), first.cursor)
+
+    assert not first.appended and first.events == EVENTS
+    assert grown.appended and grown.events == MORE
+    path.write_text(json.dumps(EVENTS + MORE + EVENTS[:1], indent=2))
+    assert read_json_array(str(path), grown.cursor).events == EVENTS[:1]
+
+
+def test_replaced_array_is_decoded_in_full(tmp_path):
+    path = tmp_path / "theater_a.json"
+    path.write_text(json.dumps(EVENTS))
+    cursor = read_json_array(str(path)).cursor
+    replaced = [{**EVENTS[0], "value": "Dr.Meril M"}] + EVENTS[1:] + MORE
+    path.write_text(json.dumps(replaced))
+    read = read_json_array(str(path), cursor)
+
+    assert not read.appended and read.events == replaced
+
+
+def test_edited_tail_is_decoded_in_full(tmp_path):
+    path = tmp_path / "theater_a.json"
+    path.write_text(json.dumps(EVENTS))
+    cursor = read_json_array(str(path)).cursor
+    edited = EVENTS[:-1] + [{**EVENTS[-1], "value": "22"}] + MORE
+    path.write_text(json.dumps(edited))
+    read = read_json_array(str(path), cursor)
+
+    assert not read.appended and read.events == edited
+
+
+def test_parse_json_log_continues_its_state(tmp_path):
+    path = tmp_path / "theater_a.json"
+    path.write_text(json.dumps(EVENTS))
+    _, state = parse_json_log(str(path))
+    path.write_text(json.dumps(EVENTS + MORE))
+    read, state = parse_json_log(str(path), state)
+
+    assert read.events is None
+    assert state["events_seen"] == len(EVENTS + MORE)
+    assert state == SurgeryParser().feed(EVENTS + MORE).to_state()
+
+
+# ─── NDJSON logs ───
+def test_half_written_line_waits_for_the_next_read(tmp_path):
+    path = tmp_path / "theater_a.ndjson"
+    line = json.dumps(MORE[0])
+    path.write_text(_lines(EVENTS) + line[:10])
+    first = read_ndjson(str(path))
+
+    assert first.events == EVENTS and first.malformed == []
+    assert first.consumed == len(_lines(EVENTS).encode())
+    with open(path, "a") as f:
+        f.write(line[10:] + "\n")
+    second = read_ndjson(str(path), first.consumed)
+
+    assert second.events == [MORE[0]]
+    assert second.first_event == EVENTS[0]
+    assert second.consumed == path.stat().st_size
+
+
+def test_truncated_ndjson_is_read_from_the_start(tmp_path):
+    path = tmp_path / "theater_a.ndjson"
+    path.write_text(_lines(EVENTS + MORE))
+    offset = read_ndjson(str(path)).consumed
+    path.write_text(_lines(MORE[:1]))  # the simulator truncates in place for each surgery
+    read = read_ndjson(str(path), offset)
+
+    assert read.start == 0 and read.events == MORE[:1]
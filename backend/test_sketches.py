@@ -0,0 +1,64 @@
+from sketches import QuantileSketch
+
+
+def _sketch(values, **kwargs) -> QuantileSketch:
+    sketch = QuantileSketch(**kwargs)
+    for value in values:
+        sketch.add(value)
+    return sketch
+
+
+# ─── Queries ───
+def test_quantiles_stay_within_the_relative_accuracy():
+    values = [float(v) for v in range(1, 1001)]
+    sketch = _sketch(values)
+
+    assert sketch.count == 1000
+    for q in (0.1, 0.5, 0.9, 0.99):
+        exact = values[int(q * 999 + 0.5)]
+        assert abs(sketch.quantile(q) - exact) <= 0.02 * exact
+
+
+def test_zero_values_and_weights_count_towards_rank():
+    sketch = QuantileSketch()
+    sketch.add(0.0, weight=3)
+    sketch.add(60.0)
+
+    assert sketch.count == 4 and sketch.zero_count == 3
+    assert sketch.quantile(0.5) == 0.0
+    assert abs(sketch.quantile(1.0) - 60.0) <= 0.02 * 60
+    assert sketch.percentile_of(0.0) == 37.5
+    assert QuantileSketch().quantile(0.5) is None
+
+
+# ─── Merging ───
+def test_merge_matches_one_sketch_of_both_histories():
+    left, right = [float(v) for v in range(1, 200)], [float(v) for v in range(150, 400)] + [0.0]
+    merged = _sketch(left)
+    merged.merge(_sketch(right))
+    together = _sketch(left + right)
+
+    assert merged.count == together.count
+    assert merged.zero_count == together.zero_count
+    assert merged.buckets == together.buckets
+
+
+def test_merge_past_max_buckets_collapses_the_low_tail():
+    merged = _sketch([2.0 ** i for i in range(8)], max_buckets=8)
+    merged.merge(_sketch([2.0 ** i for i in range(8, 16)], max_buckets=8))
+
+    assert len(merged.buckets) == 8
+    assert merged.count == 16
+    assert abs(merged.quantile(1.0) - 2.0 ** 15) <= 0.02 * 2.0 ** 15
+
+
+# ─── Persistence ───
+def test_bytes_round_trip():
+    sketch = _sketch([0.0, 0.5, 12.0, 12.1, 95.0, 240.0], relative_accuracy=0.01, max_buckets=64)
+    restored = QuantileSketch.from_bytes(sketch.to_bytes())
+
+    assert restored.relative_accuracy == 0.01 and restored.max_buckets == 64
+    assert restored.buckets == sketch.buckets
+    assert restored.zero_count == 1 and restored.count == 6
+    assert restored.quantile(0.5) == sketch.quantile(0.5)
+    assert QuantileSketch.from_bytes(QuantileSketch().to_bytes()).count == 0
@@ -0,0 +1,75 @@
+from state_store import StateStore
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _store(max_entries: int = 3, ttl: float = 10.0):
+    clock, evicted = FakeClock(), []
+    store = StateStore(max_entries, ttl, on_evict=lambda key, value: evicted.append(key), clock=clock)
+    return store, clock, evicted
+
+
+# ─── TTL ───
+def test_entries_expire_on_access():
+    store, clock, evicted = _store()
+    store.set(("log", "a"), 1)
+    store.set(("changed", "a"), True, ttl=1.5)
+    clock.now = 2.0
+
+    assert ("changed", "a") not in store
+    assert store.get(("changed", "a")) is None
+    assert store.get(("log", "a")) == 1
+    assert evicted == [("changed", "a")]
+    assert store.expired == 1 and store.hits == 1 and store.misses == 1
+
+
+def test_sweep_drops_every_expired_entry():
+    store, clock, evicted = _store()
+    store.set(("log", "a"), 1)
+    store.set(("log", "b"), 2, ttl=30.0)
+    store.set(("stat", "a"), 3)
+    clock.now = 10.0
+
+    assert store.sweep() == 2
+    assert sorted(evicted) == [("log", "a"), ("stat", "a")]
+    assert len(store) == 1 and store.get(("log", "b")) == 2
+
+
+# ─── LRU ───
+def test_least_recently_used_entry_goes_first():
+    store, _, evicted = _store(max_entries=2)
+    store.set(("log", "a"), 1)
+    store.set(("log", "b"), 2)
+    store.get(("log", "a"))  # now b is the least recently used
+    store.set(("log", "c"), 3)
+
+    assert evicted == [("log", "b")]
+    assert ("log", "a") in store and ("log", "c") in store
+    assert store.evicted == 1
+
+
+def test_pop_does_not_count_as_eviction():
+    store, _, evicted = _store()
+    store.set(("digest", "Dr.Raj"), b"x")
+
+    assert store.pop(("digest", "Dr.Raj")) == b"x"
+    assert store.pop(("digest", "Dr.Raj"), "gone") == "gone"
+    assert evicted == [] and len(store) == 0
+
+
+def test_stats_group_by_kind():
+    store, _, _ = _store(max_entries=10)
+    store.set(("log", "a"), 1)
+    store.set(("log", "b"), 1)
+    store.set(("stat", "a"), 1)
+    store.set("loose", 1)
+
+    stats = store.stats()
+    assert stats["by_kind"] == {"log": 2, "stat": 1, "other": 1}
+    assert stats["entries"] == 4 and stats["capacity"] == 10
@@ -0,0 +1,74 @@
+import json
+
+from surgery_parser import SurgeryParser, parse_surgery_json
+
+EVENTS = [
+    {"time": "2025-01-06T08:00:00", "event": "Surgery type selected", "value": "Nephrectomy"},
+    {"time": "2025-01-06T08:00:00", "event": "Surgeon Name", "value": "Dr.Raj"},
+    {"time": "2025-01-06T08:00:00", "event": "Patient Info", "value": "Name: P, Age: 40"},
+    {"time": "2025-01-06T08:00:00", "event": "Surgery started", "value": "2025-01-06 08:00:00"},
+    {"time": "2025-01-06T08:01:00", "event": "PrimaryLeft Instrument Name", "value": "SynchroSeal"},
+    {"time": "2025-01-06T08:01:30", "event": "Clutch Pedal Pressed", "value": "1"},
+    {"time": "2025-01-06T08:02:00", "event": "Clutch Pedal Pressed", "value": "2"},
+]
+MORE = [
+    {"time": "2025-01-06T08:03:00", "event": "PrimaryLeft Instrument removed", "value": "SynchroSeal"},
+    {"time": "2025-01-06T08:04:00", "event": "Clutch Pedal Pressed", "value": "3"},
+    {"time": "2025-01-06T08:30:00", "event": "Surgery stopped", "value": "2025-01-06 08:30:00"},
+    {"time": "2025-01-06T08:30:00", "event": "Log file ended", "value": "Now"},
+]
+
+
+def test_grown_log_resumes_where_it_stopped():
+    parser = SurgeryParser().feed(EVENTS)
+    grown = EVENTS + MORE
+
+    assert parser.resumes(grown)
+    parser.feed(grown[parser.events_seen:])
+    assert parser.events_seen == len(grown)
+    assert parser.snapshot() == parse_surgery_json(grown)
+    assert parser.clutch_offsets == [90_000, 120_000, 240_000]
+
+
+def test_unchanged_log_resumes_with_nothing_to_feed():
+    parser = SurgeryParser().feed(EVENTS)
+
+    assert parser.resumes(EVENTS)
+    assert EVENTS[parser.events_seen:] == []
+
+
+def test_replaced_log_does_not_resume():
+    parser = SurgeryParser().feed(EVENTS)
+    new_first_event = [{**EVENTS[0], "time": "2025-01-07T09:00:00"}] + EVENTS[1:] + MORE
+    rewritten_tail = EVENTS[:-1] + [{**EVENTS[-1], "value": "9"}] + MORE
+
+    assert not parser.resumes(EVENTS[:3])  # shorter than what was consumed
+    assert not parser.resumes(new_first_event)
+    assert not parser.resumes(rewritten_tail)
+    assert parser.starts_with(EVENTS[0])
+    assert not parser.starts_with(new_first_event[0])
+
+
+def test_state_round_trips_through_json():
+    parser = SurgeryParser().feed(EVENTS)
+    state = json.loads(json.dumps(parser.to_state()))
+    restored = SurgeryParser.from_state(state)
+
+    assert restored.to_state() == parser.to_state()
+    assert restored.resumes(EVENTS + MORE)
+    restored.feed(MORE)
+    assert restored.snapshot() == parse_surgery_json(EVENTS + MORE)
+
+
+def test_mounting_on_an_arm_disconnects_the_instrument_it_replaces():
+    parser = SurgeryParser().feed(EVENTS + [
+        {"time": "2025-01-06T08:05:00", "event": "PrimaryLeft Instrument Name", "value": "Cadiere_Forceps"},
+        {"time": "2025-01-06T08:06:00", "event": "PrimaryRight Instrument Name", "value": "Potts_Scissors"},
+        {"time": "2025-01-06T08:07:00", "event": "PrimaryLeft Instrument Name", "value": "SynchroSeal"},
+    ])
+    snapshot = parser.snapshot(now=parser.start_time.replace(hour=9))
+
+    assert sorted(parser.connected_since) == ["Potts_Scissors", "SynchroSeal"]
+    assert parser.connected_since["SynchroSeal"].minute == 7
+    assert "active_since" not in snapshot["instruments"]["Cadiere_Forceps"]
+    assert parser.arm_instruments == {"PrimaryLeft": "SynchroSeal", "PrimaryRight": "Potts_Scissors"}
@@ -0,0 +1,83 @@
+import asyncio
+import logging
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class _LiveEntry:
+    __slots__ = ("surgery_id", "surgeon_name", "theater", "started_at", "connected_since")
+
+    def __init__(self, surgery_id: int, surgeon_name: str, theater: str, started_at: datetime,
+                 connected_since: Dict[str, datetime]):
+        self.surgery_id = surgery_id
+        self.surgeon_name = surgeon_name
+        self.theater = theater
+        self.started_at = started_at
+        self.connected_since = connected_since
+
+
+class LiveClock:
+    """In-memory wall clock for live surgeries.
+
+    Holds just the start time and the open instrument intervals of every
+    live surgery, taken from the last parse. Each tick turns them into a
+    small elapsed-time heartbeat without re-reading the log or the DB.
+    """
+
+    def __init__(self):
+        self._live: Dict[str, _LiveEntry] = {}  # surgeon → live entry
+
+    def __len__(self) -> int:
+        return len(self._live)
+
+    def track(self, surgery_id: int, surgery: dict, theater: str = ""):
+        started_at = surgery.get("started_at")
+        if not started_at:
+            return
+        connected_since = {
+            name: datetime.fromisoformat(inst["active_since"])
+            for name, inst in surgery.get("instruments", {}).items()
+            if inst.get("active_since")
+        }
+        self._live[surgery["surgeon_name"]] = _LiveEntry(
+            surgery_id, surgery["surgeon_name"], theater,
+            datetime.fromisoformat(started_at), connected_since,
+        )
+
+    def forget(self, surgeon_name: str):
+        self._live.pop(surgeon_name, None)
+
+    def forget_surgery(self, surgery_id: int):
+        """Stop ticking a live row that is being closed without its log"""
+        for name in [name for name, entry in self._live.items() if entry.surgery_id == surgery_id]:
+            del self._live[name]
+
+    def heartbeat(self, now: Optional[datetime] = None) -> List[dict]:
+        now = now or datetime.now()
+        messages = []
+        for entry in self._live.values():
+            elapsed = max(0, int((now - entry.started_at).total_seconds()))
+            messages.append({
+                "type": "surgery_tick",
+                "surgeon_name": entry.surgeon_name,
+                "surgery_id": entry.surgery_id,
+                "theater": entry.theater,
+                "elapsed_seconds": elapsed,
+                "duration": elapsed // 60,
+                "active_instruments": {
+                    name: max(0, int((now - since).total_seconds()))
+                    for name, since in entry.connected_since.items()
+                },
+            })
+        return messages
+
+    async def run(self, interval: float, send: Callable[[dict], Awaitable[None]]):
+        while True:
+            await asyncio.sleep(interval)
+            for message in self.heartbeat():
+                try:
+                    await send(message)
+                except Exception as e:
+                    logger.error(f"Tick error: {e}")
@@ -0,0 +1,118 @@
+import sys
+import time
+import asyncio
+import heapq
+import itertools
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, List, Tuple
+
+from database import WaitStats
+
+# ========================================
+# SLOW-OPERATION SPANS
+# ========================================
+class Tracer:
+    """Opt-in timing spans that keep only the slowest N records per stage.
+
+    Each stage holds a fixed-size min-heap, so recording costs O(log N) and
+    memory stays constant no matter how long the server runs. When disabled
+    `span` is a no-op apart from one attribute check.
+    """
+
+    def __init__(self, enabled: bool = False, keep: int = 20):
+        self.enabled = enabled
+        self.keep = keep
+        self._slowest: Dict[str, List[Tuple[float, int, dict]]] = {}
+        self._counts: Counter = Counter()
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, stage: str, **attrs):
+        if not self.enabled:
+            yield
+            return
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - started, **attrs)
+
+    def record(self, stage: str, seconds: float, **attrs):
+        entry = {
+            "duration_ms": round(seconds * 1000, 3),
+            "at": datetime.now().isoformat(timespec="milliseconds"),
+            **attrs,
+        }
+        with self._lock:
+            self._counts[stage] += 1
+            heap = self._slowest.setdefault(stage, [])
+            item = (seconds, next(self._seq), entry)
+            if len(heap) < self.keep:
+                heapq.heappush(heap, item)
+            elif seconds > heap[0][0]:
+                heapq.heapreplace(heap, item)
+
+    def slowest(self) -> Dict[str, dict]:
+        with self._lock:
+            return {
+                stage: {
+                    "count": self._counts[stage],
+                    "slowest": [entry for _, _, entry in sorted(heap, reverse=True)],
+                }
+                for stage, heap in sorted(self._slowest.items())
+            }
+
+
+# ========================================
+# EVENT LOOP LAG
+# ========================================
+class LoopLagMonitor:
+    """How late the event loop wakes a short sleep – time it spent blocked"""
+
+    def __init__(self, interval: float = 0.1):
+        self.interval = interval
+        self.lag = WaitStats()
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.lag.record(max(0.0, loop.time() - expected))
+
+    def stats(self) -> dict:
+        return self.lag.as_dict()
+
+
+# ========================================
+# SAMPLING PROFILER
+# ========================================
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_filename.rsplit('/', 1)[-1]}:{code.co_name}"
+
+
+def sample_thread(thread_id: int, seconds: float, interval: float = 0.005) -> str:
+    """Sample one thread's stack and return it in collapsed-stack format.
+
+    Each output line is `outer;...;inner count`, ready for flamegraph.pl or
+    speedscope. Runs in the calling thread, so call it from a worker thread
+    to profile the event loop.
+    """
+    stacks: Counter = Counter()
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        frame = sys._current_frames().get(thread_id)
+        if frame is None:
+            break
+        labels = []
+        while frame is not None:
+            labels.append(_frame_label(frame))
+            frame = frame.f_back
+        stacks[";".join(reversed(labels))] += 1
+        time.sleep(interval)
+    return "\n".join(f"{stack} {count}" for stack, count in stacks.most_common())
@@ -1,6 +1,6 @@
 import React, { createContext, useContext, useState, useEffect, useCallback } from 'react';
 import axios from 'axios';
-import type { ProcessedSurgery, SurgicalData } from '../types/index';
+import type { ColumnarHistory, ProcessedSurgery, SurgeryAlert, SurgicalData } from '../types/index';
 import { useWebSocket } from '../hooks/useWebSocket';
 
 interface DataContextType {
@@ -10,6 +10,7 @@ interface DataContextType {
   hasData: boolean;
   isLoading: boolean;
   liveSurgery: ProcessedSurgery | null;
+  alerts: SurgeryAlert[];
   selectedHistorySurgery: ProcessedSurgery | null;
   setSelectedHistorySurgery: React.Dispatch<React.SetStateAction<ProcessedSurgery | null>>;
   fetchData: () => Promise<void>;
@@ -50,11 +51,43 @@ export const processSurgicalData = (data: SurgicalData[]): ProcessedSurgery[] =>
   });
 };
 
+// Columnar history arrives already split and timestamped, so rows are
+// rebuilt without any string parsing
+export const processColumnarHistory = (data: ColumnarHistory): ProcessedSurgery[] => {
+  const { columns, instrument_names, instrument_images } = data;
+  const surgeries: ProcessedSurgery[] = [];
+  for (let i = 0; i < data.count; i++) {
+    const startedAt = columns.started_at[i];
+    surgeries.push({
+      id: columns.id[i],
+      procedure_name: columns.procedure_name[i],
+      date: columns.date[i],
+      time: columns.time[i],
+      duration: columns.duration[i],
+      surgeon_name: columns.surgeon_name[i],
+      surgeon_image: '',
+      patient_info: columns.patient_info[i],
+      clutch_count: columns.clutch_count[i],
+      created_at: columns.created_at[i],
+      is_live: columns.is_live[i] ? 1 : 0,
+      instruments: columns.instruments[i].map(([name, duration]) => ({
+        name: instrument_names[name],
+        duration,
+        image: instrument_images[name],
+      })),
+      clutches: [],
+      datetime: startedAt !== null ? new Date(startedAt) : new Date(`${columns.date[i]}T${columns.time[i]}`),
+    } as ProcessedSurgery);
+  }
+  return surgeries;
+};
+
 export const DataProvider: React.FC<{ children: React.ReactNode }> = ({ children }) => {
   const [surgeries, setSurgeries] = useState<ProcessedSurgery[]>([]);
   const [isLoading, setIsLoading] = useState(false);
   const [surgeonName, setSurgeonName] = useState('');
   const [liveSurgery, setLiveSurgery] = useState<ProcessedSurgery | null>(null);
+  const [alerts, setAlerts] = useState<SurgeryAlert[]>([]);
   const [selectedHistorySurgery, setSelectedHistorySurgery] = useState<ProcessedSurgery | null>(null);
 
   const filteredSurgeries = surgeries;
@@ -73,9 +106,14 @@ export const DataProvider: React.FC<{ children: React.ReactNode }> = ({ children
       }
       
       console.log(`Fetching surgeries for: ${surgeon}`);
-      const surgeriesRes = await axios.get(`${API_BASE_URL}/surgeries/${surgeon}`);
+      const surgeriesRes = await axios.get(`${API_BASE_URL}/surgeries/${surgeon}`, {
+        params: { format: 'columnar' },
+      });
       
-      const processedData = processSurgicalData(surgeriesRes.data || []);
+      // Older servers ignore the format and still send one dict per row
+      const processedData = Array.isArray(surgeriesRes.data)
+        ? processSurgicalData(surgeriesRes.data)
+        : processColumnarHistory(surgeriesRes.data);
       setSurgeries(processedData);
       
       const live = processedData.find((s: any) => s.is_live === 1);
@@ -93,7 +131,7 @@ export const DataProvider: React.FC<{ children: React.ReactNode }> = ({ children
     console.log('📨 WebSocket message:', data);
     
     const surgeryData = data.surgery;
-    const messageSurgeon = data.surgeon_name || surgeryData.surgeon_name;
+    const messageSurgeon = data.surgeon_name || surgeryData?.surgeon_name;
     
     if (!surgeonName) {
       setSurgeonName(messageSurgeon);
@@ -105,12 +143,18 @@ export const DataProvider: React.FC<{ children: React.ReactNode }> = ({ children
     }
     
     if (data.type === 'surgery_update') {
-      const processed = processSurgicalData([{
+      const processed = {
         ...surgeryData,
-        instruments_names: Object.keys(surgeryData.instruments).join(','),
-        instruments_durations: Object.values(surgeryData.instruments).map((i: any) => i.duration).join(','),
+        duration: Number(surgeryData.duration),
+        instruments: Object.entries(surgeryData.instruments).map(([name, inst]: [string, any]) => ({
+          name,
+          duration: Number(inst.duration) || 0,
+          image: null,
+        })),
+        clutches: [],
+        datetime: new Date(`${surgeryData.date}T${surgeryData.time}`),
         is_live: 1
-      }])[0];
+      } as ProcessedSurgery;
       
       setLiveSurgery(processed);
       
@@ -118,13 +162,20 @@ export const DataProvider: React.FC<{ children: React.ReactNode }> = ({ children
         const filtered = prev.filter((s: any) => s.is_live !== 1);
         return [processed, ...filtered];
       });
+    } else if (data.type === 'surgery_tick') {
+      // Heartbeat between log writes – only the clock moves
+      setLiveSurgery(prev => prev ? { ...prev, duration: data.duration } : prev);
+    } else if (data.type === 'surgery_alert') {
+      // Newest first, only for the live case
+      setAlerts(prev => [data as SurgeryAlert, ...prev.filter(a => a.surgery_id === data.surgery_id)].slice(0, 20));
     } else if (data.type === 'surgery_complete') {
       setLiveSurgery(null);
+      setAlerts([]);
       fetchData(messageSurgeon);
     }
   }, [fetchData, surgeonName]);
 
-  useWebSocket(WS_URL, handleWebSocketMessage);
+  useWebSocket(WS_URL, handleWebSocketMessage, surgeonName || undefined);
 
   useEffect(() => {
     if (surgeonName) {
@@ -141,6 +192,7 @@ export const DataProvider: React.FC<{ children: React.ReactNode }> = ({ children
         hasData,
         isLoading,
         liveSurgery,
+        alerts,
         selectedHistorySurgery,
         setSelectedHistorySurgery,
         fetchData,
@@ -1,15 +1,46 @@
 import { useEffect, useRef, useState } from 'react';
 
 interface WebSocketMessage {
-  type: 'surgery_update' | 'surgery_complete';
-  surgery: any;
+  type: 'surgery_update' | 'surgery_complete' | 'surgery_tick' | 'surgery_alert';
+  surgery?: any;
   is_live?: boolean;
+  // Live updates: where this case sits in the surgeon's history for the procedure (0–100)
+  percentiles?: {
+    samples: number;
+    median_duration: number;
+    duration: number | null;
+    clutch_rate: number | null;
+    instruments: Record<string, number>;
+  } | null;
+  // surgery_alert: which rule fired, for what (an instrument name, or null) and why
+  rule?: 'clutch_rate_spike' | 'instrument_connected_long' | 'duration_beyond_norm';
+  subject?: string | null;
+  value?: number;
+  limit?: number;
+  message?: string;
+  at?: string;
+  surgery_id?: number;
+  theater?: string;
 }
 
-export function useWebSocket(url: string, onMessage: (data: WebSocketMessage) => void) {
+// With a surgeon the server only sends that surgeon's broadcasts; without
+// one the socket receives everything
+export function useWebSocket(url: string, onMessage: (data: WebSocketMessage) => void, surgeon?: string) {
   const ws = useRef<WebSocket | null>(null);
+  const surgeonRef = useRef(surgeon);
   const [isConnected, setIsConnected] = useState(false);
 
+  const subscribe = (name?: string) => {
+    if (name && ws.current?.readyState === WebSocket.OPEN) {
+      ws.current.send(JSON.stringify({ action: 'subscribe', surgeon: name }));
+    }
+  };
+
+  useEffect(() => {
+    surgeonRef.current = surgeon;
+    subscribe(surgeon);
+  }, [surgeon]);
+
   useEffect(() => {
     const connect = () => {
       ws.current = new WebSocket(url);
@@ -17,6 +48,7 @@ export function useWebSocket(url: string, onMessage: (data: WebSocketMessage) =>
       ws.current.onopen = () => {
         console.log('🔌 WebSocket connected');
         setIsConnected(true);
+        subscribe(surgeonRef.current);
       };
 
       ws.current.onmessage = (event: MessageEvent) => {
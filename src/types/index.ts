@@ -31,4 +31,37 @@ export interface ProcessedSurgery extends Omit<SurgicalData, 'duration' | 'instr
   instruments: Instrument[];
   clutches: Clutch[];
   datetime: Date;
-}
\ No newline at end of file
+}
+// GET /surgeries/{surgeon}?format=columnar – one array per field; each
+// instruments entry is a list of [index into instrument_names, minutes]
+export interface ColumnarHistory {
+  count: number;
+  columns: {
+    id: number[];
+    procedure_name: string[];
+    date: string[];
+    time: string[];
+    duration: number[];
+    surgeon_name: string[];
+    patient_info: string[];
+    clutch_count: number[];
+    created_at: string[];
+    is_live: boolean[];
+    started_at: (number | null)[];
+    instruments: [number, number][][];
+  };
+  instrument_names: string[];
+  instrument_images: (string | null)[];
+}
+
+// A surgery_alert from the server's live anomaly rules
+export interface SurgeryAlert {
+  rule: 'clutch_rate_spike' | 'instrument_connected_long' | 'duration_beyond_norm';
+  subject: string | null;
+  value: number;
+  limit: number;
+  message: string;
+  at: string;
+  surgery_id: number;
+  theater: string;
+}
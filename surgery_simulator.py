@@ -1,3 +1,4 @@
+import os
 import json
 import time
 import random
@@ -7,6 +8,8 @@ from pathlib import Path
 # Configuration
 WATCH_FOLDER = Path(__file__).parent / "watch_folder"
 OUTPUT_FILE = WATCH_FOLDER / "current_surgery.json"
+NDJSON_FILE = WATCH_FOLDER / "current_surgery.ndjson"
+LOG_FORMAT = "json"  # "json": whole array rewritten per tick, "ndjson": one event per line, appended
 SURGERY_DURATION_MINUTES = 45
 LIVE_UPDATE_INTERVAL = 5  # Update every 5 seconds (simulates real-time)
 
@@ -30,6 +33,23 @@ def create_watch_folder():
     WATCH_FOLDER.mkdir(exist_ok=True)
     print(f"✅ Watch folder ready: {WATCH_FOLDER}")
 
+def write_log(events, written=0):
+    """Put events on disk and return how many are there now.
+
+    NDJSON appends only the events after `written`. The JSON array is
+    rewritten into a temp file and renamed over the log, so the backend
+    never reads a half-written file.
+    """
+    if LOG_FORMAT == "ndjson":
+        with open(NDJSON_FILE, 'a' if written else 'w') as f:
+            f.write("".join(json.dumps(event) + "\n" for event in events[written:]))
+    else:
+        tmp = OUTPUT_FILE.with_name(f".{OUTPUT_FILE.name}.tmp")
+        with open(tmp, 'w') as f:
+            json.dump(events, f, indent=2)
+        os.replace(tmp, OUTPUT_FILE)
+    return len(events)
+
 def generate_patient_info():
     """Generate random patient information"""
     name = f"Patient_{random.randint(1, 100)}"
@@ -85,8 +105,7 @@ def simulate_live_surgery():
     })
     
     # Write initial file (surgery started, duration = 0)
-    with open(OUTPUT_FILE, 'w') as f:
-        json.dump(events, f, indent=2)
+    written = write_log(events)
     print(f"🔴 LIVE surgery started (0 min)\n")
     
     # Generate clutch presses schedule
@@ -169,8 +188,7 @@ def simulate_live_surgery():
                 instruments_added.add(inst['name'])
         
         # Write updated file (still LIVE, no stop event yet)
-        with open(OUTPUT_FILE, 'w') as f:
-            json.dump(events, f, indent=2)
+        written = write_log(events, written)
         
         print(f"🔴 LIVE UPDATE: {current_minute}/{SURGERY_DURATION_MINUTES} min | Clutch: {clutch_count} | Instruments: {len(instruments_added)}")
     
@@ -216,8 +234,7 @@ def simulate_live_surgery():
     })
     
     # Write final completed file (with the new "Log file ended" entry)
-    with open(OUTPUT_FILE, 'w') as f:
-        json.dump(events, f, indent=2)
+    write_log(events, written)
     
     print("\n" + "="*60)
     print("🎉 SURGERY COMPLETED!")
@@ -225,7 +242,7 @@ def simulate_live_surgery():
     print(f"Total Events: {len(events)}")
     print(f"Clutch Presses: {clutch_count}")
     print(f"Instruments: {len(instruments_added)}")
-    print(f"File: {OUTPUT_FILE}")
+    print(f"File: {NDJSON_FILE if LOG_FORMAT == 'ndjson' else OUTPUT_FILE}")
     print("="*60 + "\n")
 
 def simulate_quick_test():
@@ -245,6 +262,8 @@ if __name__ == "__main__":
     print("="*60)
     
     choice = input("\nEnter choice (1-2, or Enter for full): ").strip()
+    if input("Log format (json/ndjson, or Enter for json): ").strip().lower() == "ndjson":
+        LOG_FORMAT = "ndjson"
     
     if choice == "2":
         simulate_quick_test()